@@ -97,6 +97,27 @@ def process_files(csv_folder, column_selection, column_rename, output_file):
     # Write to a parquet file
     combined_df.to_parquet(output_file)
 
+def read_wsb_lake(dataset_path, start_date, end_date):
+    """
+    Reads the rows of a dataset written by wsb_data_fetch/zst_to_parquet.py with
+    start_date <= datetime_utc < end_date, in the same columns as the output of process_files.
+
+    The year/month filter prunes the partitions outside the range, so a backfill of
+    build_context_chain only reads the months it needs.
+
+    Parameters:
+    - dataset_path: The comments or submissions dataset directory.
+    - start_date, end_date: Dates (or date strings) in UTC.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    months = pd.period_range(start, end - pd.Timedelta(microseconds=1), freq='M')
+    partition_filter = ' OR '.join(f'(year = {month.year} AND month = {month.month})' for month in months)
+    return spark.read.parquet(dataset_path) \
+        .where(partition_filter) \
+        .where((col('datetime_utc') >= lit(start.tz_localize('UTC').to_pydatetime())) &
+               (col('datetime_utc') < lit(end.tz_localize('UTC').to_pydatetime()))) \
+        .drop('year', 'month')
+
 def build_context_chain(comments: DataFrame, submissions: DataFrame, max_depth: int = None) -> DataFrame:
     # Alias submissions and comments with unique column names
     submissions_kv = submissions.select(
@@ -455,10 +476,18 @@ if __name__ == "__main__":
 import pandas as pd
 import yfinance as yf
 import pandas as pd
+import glob
+import os
 from datetime import datetime, timedelta
 
 def read_and_process_parquet(file_path: str) -> pd.DataFrame:
-    df = pd.read_parquet(file_path)
+    frames = [pd.read_parquet(file_path)] if os.path.exists(file_path) else []
+    # Articles fetched since the last compaction are still in fetch_date partitions next to the file
+    ticker = os.path.basename(file_path)[:-len('_news.parquet')]
+    partitions_dir = os.path.join(os.path.dirname(file_path), f'ticker={ticker}')
+    if glob.glob(os.path.join(partitions_dir, 'fetch_date=*')):
+        frames.append(pd.read_parquet(partitions_dir).drop(columns=['fetch_date']))
+    df = pd.concat(frames, ignore_index=True)
     df = df.drop_duplicates(subset=['title', 'time_published', 'url'])
     df['date'] = pd.to_datetime(df['time_published']).dt.strftime('%Y-%m-%d')
     return df
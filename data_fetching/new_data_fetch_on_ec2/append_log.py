@@ -0,0 +1,147 @@
+import datetime
+import glob
+import os
+import shutil
+import time
+
+import pandas as pd
+
+
+class DailyAppendLog:
+    """Append-only storage for fetched Reddit records, one directory per UTC day.
+
+    Each day has a `<day>-<suffix>.parts` directory holding Parquet batches and a
+    `seen_ids.txt` index of the id and a fingerprint of every record written, so a run
+    only appends records that are new or changed since they were stored (e.g. edited
+    comments fetched again through the checkpoint overlap). Where a record was stored
+    more than once, its newest version wins.
+
+    While the day is still being fetched, each batch is also appended as it is to the
+    `<day>-<suffix>.csv` file read downstream, so a run never reads or rewrites what is
+    already stored; a record stored again after a change then appears below its older
+    version. Once the day is closed, `compact` rewrites the CSV a last time, keeping the
+    newest version of each record, sorted by merge, and removes the directory.
+    """
+
+    def __init__(self, directory, suffix, day_column, id_column='ID'):
+        self.directory = directory
+        self.suffix = suffix
+        self.day_column = day_column
+        self.id_column = id_column
+        self._seen = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def parts_dir(self, day):
+        return os.path.join(self.directory, f'{day}-{self.suffix}.parts')
+
+    def csv_path(self, day):
+        return os.path.join(self.directory, f'{day}-{self.suffix}.csv')
+
+    def seen_ids(self, day):
+        """{id: fingerprint} of the records already appended for the day, loaded once from its index file."""
+        if day not in self._seen:
+            self._seen[day] = {}
+            index_path = os.path.join(self.parts_dir(day), 'seen_ids.txt')
+            if os.path.exists(index_path):
+                with open(index_path, 'r') as file:
+                    for line in file:
+                        fields = line.split()
+                        if fields:
+                            # Lines without a fingerprint never match, so such records are stored again once
+                            self._seen[day][fields[0]] = fields[1] if len(fields) > 1 else None
+        return self._seen[day]
+
+    @staticmethod
+    def fingerprints(df):
+        # Hash of every column of each row, to tell a re-fetched record that changed from one that did not
+        return pd.util.hash_pandas_object(df, index=False).map('{:016x}'.format)
+
+    def append(self, df):
+        """Writes the records of df that are new or changed, one batch per day. Returns the row count written."""
+        if df.empty:
+            return 0
+        days = pd.to_datetime(df[self.day_column], utc=True).dt.date
+        written = 0
+        for day, group in df.groupby(days, sort=True):
+            seen = self.seen_ids(day)
+            group = group[~group[self.id_column].astype(str).duplicated(keep='last')]
+            ids = group[self.id_column].astype(str)
+            fingerprints = self.fingerprints(group)
+            changed = [seen.get(record_id) != fingerprint for record_id, fingerprint in zip(ids, fingerprints)]
+            new_rows = group[changed]
+            if new_rows.empty:
+                continue
+            self._write_batch(day, new_rows, fingerprints[changed])
+            self._append_csv(day, new_rows)
+            seen.update(zip(ids[changed], fingerprints[changed]))
+            written += len(new_rows)
+        return written
+
+    def _write_batch(self, day, batch, fingerprints):
+        parts_dir = self.parts_dir(day)
+        os.makedirs(parts_dir, exist_ok=True)
+        batch = batch.copy()
+        # PRAW fields such as Edited mix bools, floats and None; Parquet needs one type per column
+        for column in batch.columns[batch.dtypes == object]:
+            batch[column] = batch[column].astype('string')
+        # Zero-padded nanoseconds, so the part names sort in write order
+        part_name = f'part-{time.time_ns():020d}-{os.getpid()}.parquet'
+        temp_path = os.path.join(parts_dir, f'.{part_name}.tmp')
+        batch.to_parquet(temp_path, index=False)
+        os.replace(temp_path, os.path.join(parts_dir, part_name))
+        # The index is only extended after the batch is in place, so a crash in between at worst
+        # stores a record twice, which compaction removes
+        with open(os.path.join(parts_dir, 'seen_ids.txt'), 'a') as file:
+            file.write(''.join(f'{record_id} {fingerprint}\n' for record_id, fingerprint
+                               in zip(batch[self.id_column].astype(str), fingerprints)))
+
+    def _append_csv(self, day, rows):
+        csv_path = self.csv_path(day)
+        if os.path.exists(csv_path):
+            # Same column order as the rows already in the file
+            rows = rows.reindex(columns=pd.read_csv(csv_path, nrows=0).columns)
+            rows.to_csv(csv_path, mode='a', header=False, index=False)
+        else:
+            rows.to_csv(csv_path, index=False)
+
+    def read_day(self, day):
+        """All batches appended for the day as one DataFrame, in the order they were written."""
+        parts = sorted(glob.glob(os.path.join(self.parts_dir(day), 'part-*.parquet')))
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+    def pending_days(self):
+        """Days that have batches not yet compacted into their CSV."""
+        days = []
+        for path in glob.glob(os.path.join(self.directory, f'*-{self.suffix}.parts')):
+            name = os.path.basename(path)[:-len(f'-{self.suffix}.parts')]
+            days.append(datetime.date.fromisoformat(name))
+        return sorted(days)
+
+    def compact(self, day, merge):
+        """Rewrites the day's CSV with merge(existing_df, new_df) and drops the batches. Returns the rows stored."""
+        # Newest version of each record: batches are read in write order
+        new_df = self.read_day(day)
+        if new_df.empty:
+            shutil.rmtree(self.parts_dir(day))
+            self._seen.pop(day, None)
+            return 0
+        new_df = new_df[~new_df[self.id_column].astype(str).duplicated(keep='last')]
+        csv_path = self.csv_path(day)
+        existing_df = pd.read_csv(csv_path) if os.path.exists(csv_path) else pd.DataFrame()
+        if self.id_column in existing_df:
+            # The CSV already holds every batch appended to it; only its rows for records that are not
+            # in any batch (e.g. written before the day had a log) are kept next to the batches
+            existing_df = existing_df[~existing_df[self.id_column].astype(str).isin(new_df[self.id_column].astype(str))]
+        merged_df = merge(existing_df, new_df)
+        temp_path = f'{csv_path}.tmp'
+        merged_df.to_csv(temp_path, index=False)
+        os.replace(temp_path, csv_path)
+        shutil.rmtree(self.parts_dir(day))
+        self._seen.pop(day, None)
+        return len(new_df)
+
+    def compact_closed_days(self, first_open_day, merge):
+        """Compacts every pending day before first_open_day. Returns {day: rows compacted}."""
+        return {day: self.compact(day, merge) for day in self.pending_days() if day < first_open_day}
@@ -1,30 +1,86 @@
-import praw
 import datetime
+import json
 import os
 import yaml
 import time
 import pandas as pd
+from append_log import DailyAppendLog
+from streaming import BATCH_SIZE, FetchStats, batched_frames, to_frame
 from datetime import timezone  # Import the timezone class
 
-def fetch_comments(subreddit_name='WallStreetBets', limit=300000):
-    """Fetch comments from a specified subreddit using PRAW and returns a DataFrame."""
+# Newest comment already stored, so the next run can stop iterating once it reaches it
+CHECKPOINT_FILE = 'comments_checkpoint.json'
+
+# Comments up to this many seconds older than the checkpoint are fetched again to pick up late edits.
+# Can be overridden with `comment_overlap_seconds` in config.yaml.
+CHECKPOINT_OVERLAP_SECONDS = 300
+
+# Columns of the comment CSVs and the types they are fetched as. Edited is False or the edit
+# timestamp, so it is kept as text like Distinguished.
+COMMENT_DTYPES = {
+    'Datetime': 'datetime64[ns, UTC]', 'Created UTC': 'float64', 'Author': 'string', 'Body': 'string',
+    'Distinguished': 'string', 'Edited': 'string', 'ID': 'string', 'Is Submitter': 'bool', 'Link ID': 'string',
+    'Parent ID': 'string', 'Permalink': 'string', 'Saved': 'bool', 'Score': 'int64', 'Stickied': 'bool',
+    'Submission ID': 'string', 'Subreddit': 'string', 'Subreddit ID': 'string',
+}
 
+def load_config():
     with open('../config/config.yaml', 'r') as file:
-        config = yaml.safe_load(file)
+        return yaml.safe_load(file)
+
+def create_reddit_client(config):
+    # Imported here so the fetch functions can run with any PRAW-like client (e.g. in tests)
+    import praw
+    return praw.Reddit(client_id=config['client_id'],
+                       client_secret=config['client_secret'],
+                       user_agent="my user agent")
+
+def read_checkpoint(filename=CHECKPOINT_FILE):
+    """Returns the {'id', 'created_utc'} of the newest stored comment, or None before the first run."""
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as file:
+        return json.load(file)
+
+def write_checkpoint(comments_df, filename=CHECKPOINT_FILE):
+    """Records the newest comment of comments_df, keeping the previous checkpoint if it is newer."""
+    if comments_df.empty:
+        return
+    newest = comments_df.loc[comments_df['Created UTC'].idxmax()]
+    previous = read_checkpoint(filename)
+    if previous is not None and previous['created_utc'] >= newest['Created UTC']:
+        return
+    # Written to a temporary file first so a crash never leaves a truncated checkpoint behind
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, 'w') as file:
+        json.dump({'id': newest['ID'], 'created_utc': float(newest['Created UTC'])}, file)
+    os.replace(temp_filename, filename)
+
+def iter_comments(subreddit_name='WallStreetBets', limit=300000, reddit=None, checkpoint=None,
+                  overlap_seconds=CHECKPOINT_OVERLAP_SECONDS):
+    """Yields one row tuple per comment (columns of COMMENT_DTYPES), newest first.
+
+    When a checkpoint is given iteration stops at the first comment older than the checkpoint
+    minus overlap_seconds instead of walking all `limit` comments. Any object with the PRAW
+    `subreddit(name).comments(limit=...)` interface can be passed as `reddit`.
+    """
+
+    if reddit is None:
+        reddit = create_reddit_client(load_config())
 
-    reddit = praw.Reddit(client_id=config['client_id'],
-                         client_secret=config['client_secret'],
-                         user_agent="my user agent")
+    cutoff = checkpoint['created_utc'] - overlap_seconds if checkpoint else None
 
     subreddit = reddit.subreddit(subreddit_name)
-    data = []
 
     for comment in subreddit.comments(limit=limit):
         # Keep created_utc as original Unix timestamp
         created_utc = comment.created_utc
+        # Everything from here on was stored by an earlier run
+        if cutoff is not None and (created_utc < cutoff or (overlap_seconds == 0 and comment.id == checkpoint['id'])):
+            break
         # Convert created_utc to a readable datetime object and place it as the first column
         comment_datetime = datetime.datetime.fromtimestamp(created_utc, timezone.utc)
-        data.append([
+        yield (
             comment_datetime,  # Human-readable datetime as the first column
             created_utc,  # Original Unix timestamp
             str(comment.author),  # Author
@@ -42,18 +98,23 @@ def fetch_comments(subreddit_name='WallStreetBets', limit=300000):
             str(comment.submission),  # Submission ID
             str(comment.subreddit),  # Subreddit Name
             comment.subreddit_id,  # Subreddit ID
-        ])
+        )
 
-    columns = ['Datetime', 'Created UTC', 'Author', 'Body', 'Distinguished', 'Edited', 'ID', 
-               'Is Submitter', 'Link ID', 'Parent ID', 'Permalink', 'Saved', 'Score', 'Stickied', 
-               'Submission ID', 'Subreddit', 'Subreddit ID']
-    return pd.DataFrame(data, columns=columns)
+def fetch_comment_batches(subreddit_name='WallStreetBets', limit=300000, reddit=None, checkpoint=None,
+                          overlap_seconds=CHECKPOINT_OVERLAP_SECONDS, batch_size=BATCH_SIZE):
+    """Fetch comments as typed DataFrames of at most batch_size rows, so memory does not grow with limit."""
+    return batched_frames(iter_comments(subreddit_name, limit, reddit, checkpoint, overlap_seconds),
+                          COMMENT_DTYPES, batch_size)
+
+def fetch_comments(subreddit_name='WallStreetBets', limit=300000, reddit=None, checkpoint=None,
+                   overlap_seconds=CHECKPOINT_OVERLAP_SECONDS):
+    """Fetch comments from a specified subreddit using PRAW and returns a DataFrame."""
+    batches = list(fetch_comment_batches(subreddit_name, limit, reddit, checkpoint, overlap_seconds))
+    return pd.concat(batches, ignore_index=True) if batches else to_frame([], COMMENT_DTYPES)
 
 def read_csv_if_exists(filename):
     """Returns a DataFrame from a CSV file if it exists, or an empty DataFrame otherwise."""
-    return pd.read_csv(filename) if os.path.exists(filename) else pd.DataFrame(columns = ['Datetime', 'Created UTC', 'Author', 'Body', 'Distinguished', 'Edited', 'ID', 
-               'Is Submitter', 'Link ID', 'Parent ID', 'Permalink', 'Saved', 'Score', 'Stickied', 
-               'Submission ID', 'Subreddit', 'Subreddit ID'])
+    return pd.read_csv(filename) if os.path.exists(filename) else pd.DataFrame(columns=list(COMMENT_DTYPES))
 
 def merge_and_deduplicate(original_df, new_df):
     """Merges two DataFrames, sorts by 'Datetime' and 'Body', and removes duplicate rows, keeping the last."""
@@ -78,33 +139,48 @@ def merge_and_deduplicate(original_df, new_df):
     
     return combined_df
 
-def update_csv():
+def update_csv(reddit=None, overlap_seconds=None):
     comments_dir = 'test_fetch'
     os.makedirs(comments_dir, exist_ok=True)
+    checkpoint_filename = os.path.join(comments_dir, CHECKPOINT_FILE)
     
     today = datetime.datetime.now(timezone.utc).date()
     yesterday = today - datetime.timedelta(days=1)
 
-    current_csv_filename = os.path.join(comments_dir, f'{today}-wsb-comments.csv')
-    previous_csv_filename = os.path.join(comments_dir, f'{yesterday}-wsb-comments.csv')
-
-    new_comments_df = fetch_comments()
-
-    # Directly extract and use the 'date' part for filtering without adding it as a separate column
-    current_df = new_comments_df[pd.to_datetime(new_comments_df['Datetime'], utc=True).dt.date == today]
-    previous_df_new = new_comments_df[pd.to_datetime(new_comments_df['Datetime'], utc=True).dt.date == yesterday]
-
-    if not current_df.empty:
-        existing_df = read_csv_if_exists(current_csv_filename)
-        updated_current_df = merge_and_deduplicate(existing_df, current_df)
-        # Ensure the 'date' column is not included in the saved CSV
-        updated_current_df.to_csv(current_csv_filename, index=False)
-
-    if not previous_df_new.empty:
-        previous_df = read_csv_if_exists(previous_csv_filename)
-        updated_previous_df = merge_and_deduplicate(previous_df, previous_df_new)
-        # Ensure the 'date' column is not included in the saved CSV
-        updated_previous_df.to_csv(previous_csv_filename, index=False)
+    # Appends only the comments that are new or changed to today's and yesterday's CSVs, which are sorted once closed
+    comments_log = DailyAppendLog(comments_dir, 'wsb-comments', day_column='Datetime')
+
+    if reddit is None:
+        config = load_config()
+        reddit = create_reddit_client(config)
+        if overlap_seconds is None:
+            overlap_seconds = config.get('comment_overlap_seconds')
+    if overlap_seconds is None:
+        overlap_seconds = CHECKPOINT_OVERLAP_SECONDS
+
+    checkpoint = read_checkpoint(checkpoint_filename)
+    stats = FetchStats()
+    appended = 0
+    newest_batch = None
+    # Each batch is stored before the next one is fetched, so memory stays bounded whatever the limit is
+    for batch in fetch_comment_batches(reddit=reddit, checkpoint=checkpoint, overlap_seconds=overlap_seconds):
+        stats.add(len(batch))
+        # The listing is newest first, so the first batch holds the newest comment
+        if newest_batch is None:
+            newest_batch = batch
+        # Only today and yesterday are kept, as before
+        fetched_days = batch['Datetime'].dt.date
+        appended += comments_log.append(batch[fetched_days.isin([today, yesterday])])
+    print(f"{datetime.datetime.now(timezone.utc)} - INFO - {stats.summary('comments')}, checkpoint {checkpoint}")
+    print(f"{datetime.datetime.now(timezone.utc)} - INFO - Appended {appended} new comments")
+
+    # Nothing older than yesterday is fetched any more, so those days can be compacted
+    for day, rows in comments_log.compact_closed_days(yesterday, merge_and_deduplicate).items():
+        print(f"{datetime.datetime.now(timezone.utc)} - INFO - Compacted {rows} comments into {comments_log.csv_path(day)}")
+
+    # Only advance the checkpoint once the comments it covers are on disk
+    if newest_batch is not None:
+        write_checkpoint(newest_batch, checkpoint_filename)
 
 def safe_update_csv(attempts=3, delay=10):
     """
@@ -1,37 +1,55 @@
-import praw
 import datetime
 import os
 import yaml
 import time
 import pandas as pd
+from append_log import DailyAppendLog
+from streaming import BATCH_SIZE, FetchStats, batched_frames, to_frame
 from datetime import timezone  # Necessary for handling time zones
 
-def fetch_posts(subreddit_name='WallStreetBets', limit=3000):
-    """Fetch posts from a specified subreddit using PRAW and returns a DataFrame."""
+# Columns of the post CSVs and the types they are fetched as
+POST_DTYPES = {
+    'Title': 'string', 'Score': 'int64', 'ID': 'string', 'URL': 'string', 'Comms_Num': 'int64',
+    'Created': 'float64', 'Body': 'string', 'Timestamp': 'string',
+}
 
+def load_config():
     # Load Reddit app config from a YAML file
     with open('../config/config.yaml', 'r') as file:
-        config = yaml.safe_load(file)
+        return yaml.safe_load(file)
 
+def create_reddit_client(config):
     # Initialize the Reddit instance with credentials from the config file
-    reddit = praw.Reddit(client_id=config['client_id'],
-                         client_secret=config['client_secret'],
-                         user_agent="my user agent")
+    # Imported here so the fetch functions can run with any PRAW-like client (e.g. in tests)
+    import praw
+    return praw.Reddit(client_id=config['client_id'],
+                       client_secret=config['client_secret'],
+                       user_agent="my user agent")
+
+def iter_posts(subreddit_name='WallStreetBets', limit=3000, reddit=None):
+    """Yields one row tuple per post (columns of POST_DTYPES), newest first."""
+    if reddit is None:
+        reddit = create_reddit_client(load_config())
 
     subreddit = reddit.subreddit(subreddit_name)
-    data = []
 
     # Fetch the latest posts based on the limit
     for post in subreddit.new(limit=limit):
         post_datetime = datetime.datetime.fromtimestamp(post.created_utc, timezone.utc)
         readable_timestamp = post_datetime.strftime('%Y-%m-%d %H:%M:%S')
-        data.append([
+        yield (
             post.title, post.score, post.id, post.url, post.num_comments,
             post.created_utc, post.selftext, readable_timestamp
-        ])
+        )
 
-    # Return a DataFrame with the fetched post data
-    return pd.DataFrame(data, columns=['Title', 'Score', 'ID', 'URL', 'Comms_Num', 'Created', 'Body', 'Timestamp'])
+def fetch_post_batches(subreddit_name='WallStreetBets', limit=3000, reddit=None, batch_size=BATCH_SIZE):
+    """Fetch posts as typed DataFrames of at most batch_size rows, so memory does not grow with limit."""
+    return batched_frames(iter_posts(subreddit_name, limit, reddit), POST_DTYPES, batch_size)
+
+def fetch_posts(subreddit_name='WallStreetBets', limit=3000, reddit=None):
+    """Fetch posts from a specified subreddit using PRAW and returns a DataFrame."""
+    batches = list(fetch_post_batches(subreddit_name, limit, reddit))
+    return pd.concat(batches, ignore_index=True) if batches else to_frame([], POST_DTYPES)
 
 def read_csv_if_exists(filename):
     """Returns a DataFrame from a CSV file if it exists, or an empty DataFrame otherwise."""
@@ -52,30 +70,30 @@ def merge_and_deduplicate(original_df, new_df):
     
     return combined_df
 
-def update_csv(subreddit_name='WallStreetBets', limit=3000):
+def update_csv(subreddit_name='WallStreetBets', limit=3000, reddit=None):
     comments_dir = 'posts'
     os.makedirs(comments_dir, exist_ok=True)
     
     today = datetime.datetime.now(timezone.utc).date()
     yesterday = today - datetime.timedelta(days=1)
 
-    current_csv_filename = os.path.join(comments_dir, f'{today}-wsb-posts.csv')
-    previous_csv_filename = os.path.join(comments_dir, f'{yesterday}-wsb-posts.csv')
-
-    new_posts_df = fetch_posts(subreddit_name, limit)
-
-    current_df = new_posts_df[pd.to_datetime(new_posts_df['Timestamp'], utc=True).dt.date == today]
-    previous_df_new = new_posts_df[pd.to_datetime(new_posts_df['Timestamp'], utc=True).dt.date == yesterday]
-
-    if not current_df.empty:
-        existing_df = read_csv_if_exists(current_csv_filename)
-        updated_current_df = merge_and_deduplicate(existing_df, current_df)
-        updated_current_df.to_csv(current_csv_filename, index=False)
-
-    if not previous_df_new.empty:
-        previous_df = read_csv_if_exists(previous_csv_filename)
-        updated_previous_df = merge_and_deduplicate(previous_df, previous_df_new)
-        updated_previous_df.to_csv(previous_csv_filename, index=False)
+    # Appends only the posts that are new or changed to today's and yesterday's CSVs, which are sorted once closed
+    posts_log = DailyAppendLog(comments_dir, 'wsb-posts', day_column='Timestamp')
+
+    stats = FetchStats()
+    appended = 0
+    # Each batch is stored before the next one is fetched, so memory stays bounded whatever the limit is
+    for batch in fetch_post_batches(subreddit_name, limit, reddit):
+        stats.add(len(batch))
+        # Only today and yesterday are kept, as before
+        fetched_days = pd.to_datetime(batch['Timestamp'], utc=True).dt.date
+        appended += posts_log.append(batch[fetched_days.isin([today, yesterday])])
+    print(f"{datetime.datetime.now(timezone.utc)} - INFO - {stats.summary('posts')}")
+    print(f"{datetime.datetime.now(timezone.utc)} - INFO - Appended {appended} new posts")
+
+    # Nothing older than yesterday is fetched any more, so those days can be compacted
+    for day, rows in posts_log.compact_closed_days(yesterday, merge_and_deduplicate).items():
+        print(f"{datetime.datetime.now(timezone.utc)} - INFO - Compacted {rows} posts into {posts_log.csv_path(day)}")
 
 def safe_update_csv(attempts=3, delay=10):
     """
@@ -1,41 +1,53 @@
-import requests
+import argparse
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
+import os
+from news_client import NewsClient
+from news_store import NewsStore
 
 # Setup basic configuration for logging
 logging.basicConfig(filename='stock_news_fetch_history.log', level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
 
 def append_to_parquet_file(new_df, filename):
-    try:
-        # Attempt to read the existing data
-        existing_df = pd.read_parquet(filename)
-        updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-        logging.info(f"Appended new data to {filename}")
-    except FileNotFoundError:
-        # If the file does not exist, create a new one from the new data
-        updated_df = new_df
-        logging.info(f"Created new file {filename} as it did not exist.")
-    # Save the updated DataFrame
-    updated_df.to_parquet(filename)
+    """Adds the articles of new_df not stored yet to the news dataset of `<dir>/<TICKER>_news.parquet`."""
+    store = NewsStore(os.path.dirname(filename))
+    ticker = os.path.basename(filename)[:-len('_news.parquet')]
+    written = store.append(ticker, new_df)
+    logging.info(f"Appended {written} new of {len(new_df)} fetched articles to {store.ticker_dir(ticker)}")
+    # The compacted file is only rewritten every few fetches, not on every append
+    store.compact_if_needed(ticker)
 
-time_from = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+# Tickers whose news is fetched into ./stock-news/<TICKER>_news.parquet
+NEWS_TICKERS = ['AAPL', 'NVDA', 'TSLA']
 
-urls_to_filenames = {
-    f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers=AAPL&time_from={time_from}T0130&limit=1000&sort=EARLIEST&apikey=U0UD1WX9BNOZHJS7': './stock-news/AAPL_news.parquet',
-    f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers=NVDA&time_from={time_from}T0130&limit=1000&sort=EARLIEST&apikey=U0UD1WX9BNOZHJS7': './stock-news/NVDA_news.parquet',
-    f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers=TSLA&time_from={time_from}T0130&limit=1000&sort=EARLIEST&apikey=U0UD1WX9BNOZHJS7': './stock-news/TSLA_news.parquet'
-}
+def default_time_from():
+    # Everything published since 01:30 yesterday
+    return (datetime.now() - timedelta(days=1)).strftime('%Y%m%d') + 'T0130'
 
-for url, output_filename in urls_to_filenames.items():
-    try:
-        r = requests.get(url)
-        data = r.json()
-
-        if 'feed' in data:
+def fetch_news(tickers=NEWS_TICKERS, time_from=None, output_dir='./stock-news', client=None):
+    """Fetches the news of each ticker concurrently and appends it to the news dataset. Returns the tickers that failed."""
+    if time_from is None:
+        time_from = default_time_from()
+    if client is None:
+        client = NewsClient(cache_dir=os.path.join(output_dir, '_cache'))
+    failed = []
+    # Requests run in the client's thread pool; the dataset is written from this thread only
+    for ticker, data in client.fetch_many(tickers, time_from).items():
+        output_filename = os.path.join(output_dir, f'{ticker}_news.parquet')
+        if isinstance(data, Exception):
+            failed.append(ticker)
+        elif 'feed' in data:
             df = pd.DataFrame(data['feed'])
             append_to_parquet_file(df, output_filename)
         else:
             logging.warning(f"The 'feed' key was not found in the data for {output_filename}")
-    except Exception as e:
-        logging.error(f"Error processing {output_filename}: {str(e)}")
+            failed.append(ticker)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fetch Alpha Vantage news into ./stock-news.')
+    parser.add_argument('--tickers', default=','.join(NEWS_TICKERS))
+    parser.add_argument('--time-from', default=None, help='e.g. 20240501T0000 for a backfill; defaults to yesterday 01:30')
+    args = parser.parse_args()
+    fetch_news([ticker.strip().upper() for ticker in args.tickers.split(',')], args.time_from)
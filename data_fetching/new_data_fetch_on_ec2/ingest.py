@@ -0,0 +1,254 @@
+"""
+Runs every ingestion source of this directory on one asyncio event loop.
+
+Each source is a blocking fetch (update_csv of the Reddit scripts, fetch_news of the news
+script) run in a bounded thread pool. Every source has its own token-bucket rate limit on
+its runs and retries failures with exponential backoff and jitter instead of a fixed sleep.
+Within a run, every news API call also waits for a token of the news client's limiter
+(`api_rate_per_minute`); PRAW throttles the Reddit calls by the API's rate-limit headers.
+A status line per source is printed at the end, and the exit status is 1 if any source failed.
+
+    python ingest.py                               # every source once, e.g. from cron
+    python ingest.py --sources news --forever      # keep fetching news every `interval` seconds
+    NEWS_API_URL=http://127.0.0.1:8000/query python ingest.py --sources news
+
+Per-source settings can be overridden in config.yaml, e.g.
+    ingest:
+      comments: {rate_per_minute: 2, attempts: 5, interval: 600}
+      news: {api_rate_per_minute: 5}
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+
+import yaml
+
+
+def log(level, message):
+    # Same line format as the fetch scripts
+    print(f"{datetime.datetime.now(timezone.utc)} - {level} - {message}")
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, base_delay, max_delay, rng=random):
+    # Full jitter: a random delay up to the exponential backoff of this attempt, so retries of
+    # several sources (or hosts) failing together do not line up
+    return rng.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+class Source:
+    """A named blocking fetch function and how often and how persistently to run it.
+
+    `start_run`, if given, is called before the first attempt of every scheduled run.
+    """
+
+    def __init__(self, name, fetch, rate_per_minute=1.0, burst=1, attempts=3, base_delay=10.0, max_delay=300.0,
+                 interval=900.0, start_run=None):
+        self.name = name
+        self.fetch = fetch
+        self.start_run = start_run
+        self.bucket = TokenBucket(rate_per_minute / 60, burst)
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.interval = interval
+
+
+class SourceStatus:
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.attempts = 0
+        self.failures = 0
+        self.ok = None
+        self.last_error = None
+        self.last_duration = None
+
+    def as_dict(self):
+        return {"source": self.name, "ok": self.ok, "runs": self.runs, "attempts": self.attempts,
+                "failures": self.failures, "lastError": self.last_error, "lastDurationSeconds": self.last_duration}
+
+    def summary(self):
+        state = 'OK' if self.ok else 'FAILED'
+        error = f", last error: {self.last_error}" if self.last_error and not self.ok else ''
+        return (f"{self.name}: {state} after {self.attempts} attempt(s) in {self.runs} run(s), "
+                f"{self.failures} failure(s), last run {self.last_duration:.1f}s{error}")
+
+
+async def run_source(source, executor, status, forever=False):
+    loop = asyncio.get_running_loop()
+    while True:
+        status.runs += 1
+        if source.start_run is not None:
+            source.start_run()
+        for attempt in range(1, source.attempts + 1):
+            await source.bucket.acquire()
+            status.attempts += 1
+            log('INFO', f"{source.name}: attempt {attempt} started")
+            started_at = time.perf_counter()
+            try:
+                await loop.run_in_executor(executor, source.fetch)
+            except Exception as e:
+                status.last_duration = time.perf_counter() - started_at
+                status.failures += 1
+                status.ok = False
+                status.last_error = f"{type(e).__name__}: {e}"
+                log('ERROR', f"{source.name}: attempt {attempt} failed with error: {e}")
+                if attempt == source.attempts:
+                    log('INFO', f"{source.name}: maximum attempts reached")
+                    break
+                delay = backoff_delay(attempt, source.base_delay, source.max_delay)
+                log('INFO', f"{source.name}: retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            else:
+                status.last_duration = time.perf_counter() - started_at
+                status.ok = True
+                log('INFO', f"{source.name}: finished successfully in {status.last_duration:.1f}s")
+                break
+        if not forever:
+            return status
+        await asyncio.sleep(source.interval)
+
+
+async def run(sources, workers=4, forever=False):
+    """Runs the sources concurrently; blocking fetches share a pool of `workers` threads."""
+    statuses = {source.name: SourceStatus(source.name) for source in sources}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as executor:
+        await asyncio.gather(*(run_source(source, executor, statuses[source.name], forever) for source in sources))
+    return statuses
+
+
+def load_config(path='../config/config.yaml'):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return yaml.safe_load(file) or {}
+
+
+def fetch_comments(config):
+    # The fetch modules are imported on first use so a missing client library only fails its own source
+    import fetch_reddit_comments
+    fetch_reddit_comments.update_csv(reddit=fetch_reddit_comments.create_reddit_client(config),
+                                     overlap_seconds=config.get('comment_overlap_seconds'))
+
+
+def fetch_posts(config):
+    import fetch_reddit_posts
+    fetch_reddit_posts.update_csv(reddit=fetch_reddit_posts.create_reddit_client(config))
+
+
+class NewsFetch:
+    """fetch_news as a retryable source.
+
+    Every scheduled run requests all tickers for the time window fixed when the run
+    starts; a retry within the run only requests the tickers that failed, for the same
+    window. The client is kept across runs, so its rate limit covers every API call.
+    """
+
+    def __init__(self, tickers=None, api_rate_per_minute=None, output_dir='./stock-news', client=None):
+        self.tickers = tickers
+        self.api_rate_per_minute = api_rate_per_minute
+        self.output_dir = output_dir
+        self.client = client
+        self.pending = None
+        self.time_from = None
+
+    def start_run(self):
+        import fetch_stock_news
+        self.pending = list(self.tickers or fetch_stock_news.NEWS_TICKERS)
+        self.time_from = fetch_stock_news.default_time_from()
+
+    def __call__(self):
+        import fetch_stock_news
+        from news_client import NEWS_RATE_PER_MINUTE, NewsClient
+        if self.pending is None:
+            self.start_run()
+        if self.client is None:
+            self.client = NewsClient(cache_dir=os.path.join(self.output_dir, '_cache'),
+                                     rate_per_minute=self.api_rate_per_minute or NEWS_RATE_PER_MINUTE)
+        self.pending = fetch_stock_news.fetch_news(self.pending, self.time_from, self.output_dir, self.client)
+        if self.pending:
+            raise RuntimeError(f"news request(s) failed for {', '.join(self.pending)}")
+
+
+def default_sources(config):
+    overrides = config.get('ingest', {})
+    news = NewsFetch(api_rate_per_minute=overrides.get('news', {}).get('api_rate_per_minute'))
+    # A whole update_csv run makes many API calls, so the Reddit sources are limited to one run per minute
+    sources = [
+        Source('comments', lambda: fetch_comments(config), rate_per_minute=1, interval=900),
+        Source('posts', lambda: fetch_posts(config), rate_per_minute=1, interval=900),
+        # Requests within a run are rate limited per call by news_client.NewsClient
+        Source('news', news, rate_per_minute=1, interval=86400, start_run=news.start_run),
+    ]
+    for source in sources:
+        settings = overrides.get(source.name, {})
+        if 'rate_per_minute' in settings or 'burst' in settings:
+            source.bucket = TokenBucket(settings.get('rate_per_minute', source.bucket.rate * 60) / 60,
+                                        settings.get('burst', source.bucket.capacity))
+        for name in ('attempts', 'base_delay', 'max_delay', 'interval'):
+            if name in settings:
+                setattr(source, name, settings[name])
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', default='comments,posts,news', help='comma-separated sources to run')
+    parser.add_argument('--workers', type=int, default=4, help='threads for the blocking fetch clients')
+    parser.add_argument('--forever', action='store_true', help='rerun each source every `interval` seconds')
+    parser.add_argument('--status-file', default=None, help='also write the per-source status as JSON')
+    args = parser.parse_args()
+
+    print('-' * 100)
+
+    # Change the working directory to the script's directory, like the individual fetch scripts
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+    sys.path.insert(0, script_dir)
+
+    wanted = [name.strip() for name in args.sources.split(',') if name.strip()]
+    sources = [source for source in default_sources(load_config()) if source.name in wanted]
+    unknown = set(wanted) - {source.name for source in sources}
+    if unknown:
+        parser.error(f"unknown source(s): {', '.join(sorted(unknown))}")
+
+    statuses = asyncio.run(run(sources, args.workers, args.forever))
+    for status in statuses.values():
+        log('INFO' if status.ok else 'ERROR', status.summary())
+    if args.status_file:
+        with open(args.status_file, 'w') as file:
+            json.dump([status.as_dict() for status in statuses.values()], file, indent=2)
+    sys.exit(0 if all(status.ok for status in statuses.values()) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Alpha Vantage endpoint; can be pointed at a local stub server for testing
+NEWS_API_URL = os.environ.get('NEWS_API_URL', 'https://www.alphavantage.co/query')
+ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY', 'U0UD1WX9BNOZHJS7')
+
+# The free tier allows 5 requests per minute
+NEWS_RATE_PER_MINUTE = float(os.environ.get('NEWS_RATE_PER_MINUTE', 5))
+NEWS_MAX_WORKERS = int(os.environ.get('NEWS_MAX_WORKERS', 4))
+# A news window runs up to the time of the request, so cached responses are revalidated after this many seconds
+NEWS_CACHE_MAX_AGE = float(os.environ.get('NEWS_CACHE_MAX_AGE', 3600))
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads: rate_per_minute requests per minute, in bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst or max(1, int(rate_per_minute))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class NewsClient:
+    """Alpha Vantage NEWS_SENTIMENT client with a pooled session, a rate limit and an on-disk response cache.
+
+    Responses with a news feed are cached as `<cache_dir>/<TICKER>/<time_from>.json`, so
+    reruns and backfills over the same window do not call the API again. A cached
+    response older than `cache_max_age` seconds is revalidated: the request carries its
+    ETag, a 304 (or an answer without a feed, such as a rate-limit note) keeps it, and a
+    new feed replaces it.
+    """
+
+    def __init__(self, api_key=ALPHA_VANTAGE_API_KEY, base_url=NEWS_API_URL, cache_dir='./stock-news/_cache',
+                 max_workers=NEWS_MAX_WORKERS, rate_per_minute=NEWS_RATE_PER_MINUTE, timeout=30, session=None,
+                 cache_max_age=NEWS_CACHE_MAX_AGE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.cache_max_age = cache_max_age
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_per_minute)
+        self.session = session or self._create_session(max_workers)
+
+    @staticmethod
+    def _create_session(max_workers):
+        # Connections are reused across requests; throttling and server errors are retried with backoff
+        retry = Retry(total=3, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def params(self, ticker, time_from):
+        return {'function': 'NEWS_SENTIMENT', 'tickers': ticker, 'time_from': time_from, 'limit': 1000,
+                'sort': 'EARLIEST', 'apikey': self.api_key}
+
+    def cache_path(self, ticker, time_from):
+        return os.path.join(self.cache_dir, ticker, f'{time_from}.json')
+
+    def _write_cache(self, cache_path, data, etag):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        for path, content in ((cache_path, json.dumps(data)), (f'{cache_path}.etag', etag)):
+            if content is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'w') as file:
+                file.write(content)
+            os.replace(temp_path, path)
+
+    def fetch(self, ticker, time_from):
+        """The API response for one ticker as a dict, from the cache when it has been fetched recently."""
+        cache_path = self.cache_path(ticker, time_from)
+        cached, headers = None, {}
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r') as file:
+                cached = json.load(file)
+            if time.time() - os.path.getmtime(cache_path) < self.cache_max_age:
+                return cached
+            if os.path.exists(f'{cache_path}.etag'):
+                with open(f'{cache_path}.etag', 'r') as file:
+                    headers['If-None-Match'] = file.read()
+
+        self.rate_limiter.acquire()
+        r = self.session.get(self.base_url, params=self.params(ticker, time_from), headers=headers,
+                             timeout=self.timeout)
+        if r.status_code == 304 and cached is not None:
+            os.utime(cache_path)
+            return cached
+        r.raise_for_status()
+        data = r.json()
+
+        # Rate-limit notes and errors come back as 200 responses without a feed; those are not cached
+        if 'feed' in data:
+            self._write_cache(cache_path, data, r.headers.get('ETag'))
+        elif cached is not None:
+            logging.warning(f"Keeping the cached news of {ticker}: revalidation returned no feed")
+            return cached
+        return data
+
+    def fetch_many(self, tickers, time_from):
+        """{ticker: response dict, or the exception raised fetching it}, with requests running concurrently."""
+        def fetch_one(ticker):
+            try:
+                return self.fetch(ticker, time_from)
+            except Exception as e:
+                logging.error(f"Error fetching news for {ticker}: {e}")
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='news') as executor:
+            return dict(zip(tickers, executor.map(fetch_one, tickers)))
@@ -0,0 +1,109 @@
+import glob
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# A ticker's fetch-date partitions are merged into its compacted file once there are more than this many
+COMPACT_AFTER_PARTITIONS = 7
+
+
+class NewsStore:
+    """Append-only Alpha Vantage news, partitioned by ticker and fetch date.
+
+    New articles go to `<root>/ticker=<TICKER>/fetch_date=<YYYY-MM-DD>/part-*.parquet`,
+    after dropping URLs already listed in the ticker's `_urls.txt` index, so a fetch
+    only writes the articles it has not stored before. `compact` merges the partitions
+    into `<root>/<TICKER>_news.parquet` (the file read downstream), sorted by
+    `time_published`, and removes them.
+    """
+
+    def __init__(self, root='./stock-news', compact_after=COMPACT_AFTER_PARTITIONS):
+        self.root = root
+        self.compact_after = compact_after
+        self._seen = {}
+
+    def ticker_dir(self, ticker):
+        return os.path.join(self.root, f'ticker={ticker}')
+
+    def compacted_path(self, ticker):
+        return os.path.join(self.root, f'{ticker}_news.parquet')
+
+    def _index_path(self, ticker):
+        # Leading underscore: Parquet dataset readers skip it
+        return os.path.join(self.ticker_dir(ticker), '_urls.txt')
+
+    def seen_urls(self, ticker):
+        """URLs already stored for the ticker, loaded once from its index."""
+        if ticker not in self._seen:
+            index_path = self._index_path(ticker)
+            if os.path.exists(index_path):
+                with open(index_path, 'r') as file:
+                    self._seen[ticker] = set(file.read().splitlines())
+            else:
+                # First run against a file written before the index existed: build it from the url column only
+                seen = set()
+                if os.path.exists(self.compacted_path(ticker)):
+                    seen.update(pd.read_parquet(self.compacted_path(ticker), columns=['url'])['url'])
+                os.makedirs(self.ticker_dir(ticker), exist_ok=True)
+                with open(index_path, 'w') as file:
+                    file.write(''.join(f'{url}\n' for url in seen))
+                self._seen[ticker] = seen
+        return self._seen[ticker]
+
+    def append(self, ticker, df, fetch_date=None):
+        """Writes the articles of df whose URL is not stored yet. Returns the number of articles written."""
+        if df.empty:
+            return 0
+        seen = self.seen_urls(ticker)
+        new_df = df[~df['url'].isin(seen) & ~df['url'].duplicated()]
+        if new_df.empty:
+            return 0
+        fetch_date = fetch_date or datetime.now(timezone.utc).date()
+        partition_dir = os.path.join(self.ticker_dir(ticker), f'fetch_date={fetch_date}')
+        os.makedirs(partition_dir, exist_ok=True)
+        part_name = f'part-{time.time_ns():020d}-{os.getpid()}.parquet'
+        temp_path = os.path.join(partition_dir, f'.{part_name}.tmp')
+        new_df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, os.path.join(partition_dir, part_name))
+        # Extended after the part is in place, so a crash in between at worst stores an article twice
+        with open(self._index_path(ticker), 'a') as file:
+            file.write(''.join(f'{url}\n' for url in new_df['url']))
+        seen.update(new_df['url'])
+        return len(new_df)
+
+    def pending_partitions(self, ticker):
+        return sorted(glob.glob(os.path.join(self.ticker_dir(ticker), 'fetch_date=*')))
+
+    def read(self, ticker):
+        """Every stored article of the ticker: the compacted file followed by the pending partitions."""
+        frames = []
+        if os.path.exists(self.compacted_path(ticker)):
+            frames.append(pd.read_parquet(self.compacted_path(ticker)))
+        for partition_dir in self.pending_partitions(ticker):
+            for part in sorted(glob.glob(os.path.join(partition_dir, 'part-*.parquet'))):
+                frames.append(pd.read_parquet(part))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def compact(self, ticker):
+        """Rewrites the compacted file with every article sorted by time_published and drops the partitions."""
+        partitions = self.pending_partitions(ticker)
+        if not partitions:
+            return 0
+        df = self.read(ticker)
+        df = df.drop_duplicates(subset=['url'], keep='first').sort_values('time_published', kind='stable')
+        temp_path = f'{self.compacted_path(ticker)}.tmp'
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, self.compacted_path(ticker))
+        for partition_dir in partitions:
+            shutil.rmtree(partition_dir)
+        logging.info(f"Compacted {len(partitions)} partition(s) into {self.compacted_path(ticker)} ({len(df)} articles)")
+        return len(df)
+
+    def compact_if_needed(self, ticker):
+        if len(self.pending_partitions(ticker)) > self.compact_after:
+            return self.compact(ticker)
+        return 0
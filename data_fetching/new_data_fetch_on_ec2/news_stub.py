@@ -0,0 +1,122 @@
+"""
+Local stand-in for the Alpha Vantage NEWS_SENTIMENT endpoint, for tests and for running
+the news fetch without an API key:
+
+    python news_stub.py --port 8000
+    NEWS_API_URL=http://127.0.0.1:8000/query python ingest.py --sources news
+
+Every ticker gets a small deterministic feed of `articles` articles with an ETag; a
+conditional request (If-None-Match) for an unchanged feed gets a 304. `failures`
+({ticker: count}) makes the first `count` requests for a ticker fail: with
+`failure_status` if it is set, otherwise with a 200 response carrying the API's
+rate-limit note and no feed.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATE_LIMIT_NOTE = {'Information': 'Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day.'}
+
+
+def stub_feed(ticker, time_from, articles=3):
+    return [{'title': f'{ticker} article {n}', 'url': f'https://news.example/{ticker}/{time_from}/{n}',
+             'time_published': f'{time_from[:8]}T{n:02d}0000', 'summary': f'Summary {n}', 'source': 'Stub',
+             'overall_sentiment_score': 0.1 * n, 'overall_sentiment_label': 'Neutral'}
+            for n in range(articles)]
+
+
+class StubNewsServer:
+    """Serves NEWS_SENTIMENT on a local port in a background thread and records every request.
+
+    `requests` holds (monotonic time, query parameters, request headers) in arrival order.
+    """
+
+    def __init__(self, port=0, failures=None, failure_status=None, articles=3):
+        self.articles = articles
+        self.failures = dict(failures or {})
+        self.failure_status = failure_status
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/query'
+
+    def tickers_requested(self):
+        return [params['tickers'] for _, params, _ in self.requests]
+
+    def respond(self, params, headers):
+        """(status, body dict or None for no body, response headers) for one request."""
+        ticker = params.get('tickers', '')
+        with self._lock:
+            self.requests.append((time.monotonic(), params, headers))
+            failing = self.failures.get(ticker, 0) > 0
+            if failing:
+                self.failures[ticker] -= 1
+        if failing:
+            return (self.failure_status, {'error': 'stub failure'}, {}) if self.failure_status else (200, RATE_LIMIT_NOTE, {})
+        body = {'items': str(self.articles), 'feed': stub_feed(ticker, params.get('time_from', ''), self.articles)}
+        etag = '"%s"' % hashlib.sha256(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        if headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, body, {'ETag': etag}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {name: values[-1] for name, values in parse_qs(urlparse(self.path).query).items()}
+                status, body, headers = stub.respond(params, dict(self.headers))
+                payload = b'' if body is None else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if body is not None:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='news-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+    server = StubNewsServer(args.port)
+    print(f"Serving NEWS_SENTIMENT on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
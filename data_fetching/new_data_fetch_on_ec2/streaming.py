@@ -0,0 +1,48 @@
+import resource
+import time
+
+import pandas as pd
+
+# Records held in memory at once while fetching, whatever the fetch limit is
+BATCH_SIZE = 5000
+
+
+def to_frame(records, dtypes):
+    """Builds a DataFrame with the column types in dtypes (column name -> dtype) from a list of row tuples."""
+    columns = list(zip(*records)) or [()] * len(dtypes)
+    return pd.DataFrame({name: pd.Series(values, dtype=object).astype(dtype)
+                         for (name, dtype), values in zip(dtypes.items(), columns)})
+
+
+def batched_frames(records, dtypes, batch_size=BATCH_SIZE):
+    """Groups an iterator of row tuples into typed DataFrames of at most batch_size rows."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield to_frame(batch, dtypes)
+            batch = []
+    if batch:
+        yield to_frame(batch, dtypes)
+
+
+def peak_rss_mb():
+    # Linux reports ru_maxrss in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FetchStats:
+    """Row count and throughput of one fetch, for the summary log line."""
+
+    def __init__(self):
+        self.rows = 0
+        self.started_at = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+
+    def summary(self, noun):
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.rows / elapsed if elapsed else 0.0
+        return (f"Fetched {self.rows} {noun} in {elapsed:.1f}s ({rate:.0f} rows/s), "
+                f"peak RSS {peak_rss_mb():.0f} MB")
@@ -0,0 +1,63 @@
+import datetime
+import os
+
+import pandas as pd
+
+from append_log import DailyAppendLog
+
+DAY = datetime.date(2024, 4, 2)
+
+
+def merge(original_df, new_df):
+    # Same shape as the fetchers' merge_and_deduplicate
+    combined_df = pd.concat([original_df, new_df], ignore_index=True)
+    combined_df['Datetime'] = pd.to_datetime(combined_df['Datetime'], utc=True)
+    return combined_df.sort_values(by=['Datetime', 'ID'])
+
+
+def comments(*rows):
+    return pd.DataFrame({
+        'Datetime': pd.to_datetime([f'{DAY} {time}' for time, _, _ in rows], utc=True),
+        'ID': pd.array([record_id for _, record_id, _ in rows], dtype='string'),
+        'Body': pd.array([body for _, _, body in rows], dtype='string'),
+    })
+
+
+def test_open_day_csv_only_gets_the_new_rows_appended(tmp_path):
+    log = DailyAppendLog(str(tmp_path), 'wsb-comments', day_column='Datetime')
+    assert log.append(comments(('11:00', 'b', 'second'), ('10:00', 'a', 'first'))) == 2
+    csv_path = log.csv_path(DAY)
+    assert list(pd.read_csv(csv_path)['ID']) == ['b', 'a']
+
+    # Nothing new: the CSV is left as it is
+    modified = os.path.getmtime(csv_path)
+    assert log.append(comments(('10:00', 'a', 'first'))) == 0
+    assert os.path.getmtime(csv_path) == modified
+
+    # Only the new row is written, below the stored ones and without sorting them
+    with open(csv_path) as file:
+        stored = file.read()
+    assert log.append(comments(('09:00', 'c', 'third'))) == 1
+    with open(csv_path) as file:
+        content = file.read()
+    assert content.startswith(stored)
+    assert content[len(stored):].count('\n') == 1
+    assert list(pd.read_csv(csv_path)['ID']) == ['b', 'a', 'c']
+
+
+def test_refetched_record_keeps_its_newest_version(tmp_path):
+    log = DailyAppendLog(str(tmp_path), 'wsb-comments', day_column='Datetime')
+    log.append(comments(('10:00', 'a', 'before edit'), ('11:00', 'b', 'second')))
+
+    # A second run, e.g. the checkpoint overlap: 'a' was edited, 'b' is unchanged
+    reopened = DailyAppendLog(str(tmp_path), 'wsb-comments', day_column='Datetime')
+    assert reopened.append(comments(('10:00', 'a', 'after edit'), ('11:00', 'b', 'second'))) == 1
+    # While the day is open the newer version is appended below the older one
+    csv = pd.read_csv(log.csv_path(DAY))
+    assert list(zip(csv['ID'], csv['Body'])) == [('a', 'before edit'), ('b', 'second'), ('a', 'after edit')]
+
+    # Compacting the closed day keeps only the newest version, sorted, and drops the batches
+    assert reopened.compact_closed_days(DAY + datetime.timedelta(days=1), merge) == {DAY: 2}
+    assert reopened.pending_days() == []
+    csv = pd.read_csv(log.csv_path(DAY))
+    assert list(zip(csv['ID'], csv['Body'])) == [('a', 'after edit'), ('b', 'second')]
@@ -0,0 +1,78 @@
+import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+
+import fetch_reddit_comments
+from fetch_reddit_comments import iter_comments, read_checkpoint, update_csv
+
+
+def fake_comment(comment_id, created_utc, body):
+    return SimpleNamespace(id=comment_id, created_utc=created_utc, body=body, author='someone', distinguished=None,
+                           edited=False, is_submitter=False, link_id='t3_post', parent_id='t3_post',
+                           permalink=f'/r/wallstreetbets/comments/post/{comment_id}', saved=False, score=1,
+                           stickied=False, submission='post', subreddit='wallstreetbets', subreddit_id='t5_2th52')
+
+
+class FakeReddit:
+    """PRAW-like client: `subreddit(name).comments(limit=...)` hands out the given comments newest first."""
+
+    def __init__(self, comments):
+        self.listed = sorted(comments, key=lambda comment: -comment.created_utc)
+        self.read = 0
+
+    def subreddit(self, name):
+        return self
+
+    def comments(self, limit):
+        for comment in self.listed[:limit]:
+            self.read += 1
+            yield comment
+
+
+def stored_comments(directory):
+    day = datetime.datetime.now(datetime.timezone.utc).date()
+    csv = pd.read_csv(directory / 'test_fetch' / f'{day}-wsb-comments.csv')
+    # Today is still open, so a re-fetched comment's newest version is the last row with its ID
+    return dict(zip(csv['ID'], csv['Body']))
+
+
+def test_iteration_stops_at_the_checkpoint_minus_the_overlap():
+    comments = [fake_comment(f'c{i}', 1_000_000 + 60 * i, 'body') for i in range(100)]
+    reddit = FakeReddit(comments)
+    checkpoint = {'id': 'c89', 'created_utc': 1_000_000 + 60 * 89}
+
+    rows = list(iter_comments(reddit=reddit, checkpoint=checkpoint, overlap_seconds=300))
+    # c99..c84: everything newer than the checkpoint plus the 5 minutes before it
+    assert [row[6] for row in rows] == [f'c{i}' for i in range(99, 83, -1)]
+    assert reddit.read == len(rows) + 1
+
+    rows = list(iter_comments(reddit=FakeReddit(comments), checkpoint=checkpoint, overlap_seconds=0))
+    assert [row[6] for row in rows] == [f'c{i}' for i in range(99, 89, -1)]
+
+
+def test_checkpoint_advances_and_the_overlap_picks_up_edits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Early today, so every comment falls on the same day whatever time the test runs
+    today = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    now = today.timestamp() + 7200
+    first_run = [fake_comment(f'c{i}', now - 3600 + 60 * i, f'body {i}') for i in range(10)]
+
+    update_csv(reddit=FakeReddit(first_run), overlap_seconds=300)
+    checkpoint = read_checkpoint(str(tmp_path / 'test_fetch' / fetch_reddit_comments.CHECKPOINT_FILE))
+    assert checkpoint == {'id': 'c9', 'created_utc': first_run[-1].created_utc}
+    assert stored_comments(tmp_path) == {f'c{i}': f'body {i}' for i in range(10)}
+
+    # Two new comments, and c8 (inside the overlap window) was edited since the first run
+    second_run = first_run[:8] + [fake_comment('c8', first_run[8].created_utc, 'body 8 edited'), first_run[9]]
+    second_run += [fake_comment(f'c{i}', now - 3600 + 60 * i, f'body {i}') for i in (10, 11)]
+    reddit = FakeReddit(second_run)
+    update_csv(reddit=reddit, overlap_seconds=300)
+
+    # c11 and c10 are new, c9 down to c4 are within 5 minutes of the checkpoint; c3 ends the iteration
+    assert reddit.read == 9
+    checkpoint = read_checkpoint(str(tmp_path / 'test_fetch' / fetch_reddit_comments.CHECKPOINT_FILE))
+    assert checkpoint['id'] == 'c11'
+    stored = stored_comments(tmp_path)
+    assert stored['c8'] == 'body 8 edited'
+    assert sorted(stored) == sorted(f'c{i}' for i in range(12))
@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest import NewsFetch, Source, SourceStatus, run, run_source
+from news_client import NewsClient, RateLimiter
+from news_stub import StubNewsServer
+
+TICKERS = ['AAPL', 'NVDA', 'TSLA']
+
+
+def news_source(server, tmp_path, attempts=3, rate_per_minute=6000):
+    client = NewsClient(base_url=server.url, cache_dir=str(tmp_path / '_cache'), rate_per_minute=rate_per_minute)
+    news = NewsFetch(tickers=TICKERS, output_dir=str(tmp_path), client=client)
+    source = Source('news', news, rate_per_minute=6000, burst=10, attempts=attempts, base_delay=0.01,
+                    interval=0.01, start_run=news.start_run)
+    return news, source
+
+
+def test_retry_only_requests_the_failed_tickers_for_the_same_window(tmp_path):
+    with StubNewsServer(failures={'TSLA': 1}) as server:
+        news, source = news_source(server, tmp_path)
+        status = asyncio.run(run([source]))['news']
+
+    assert status.ok and status.attempts == 2
+    requested = server.tickers_requested()
+    assert sorted(requested[:3]) == TICKERS and requested[3:] == ['TSLA']
+    assert len({params['time_from'] for _, params, _ in server.requests}) == 1
+    assert news.pending == []
+
+
+def test_every_scheduled_run_requests_every_ticker(tmp_path):
+    requested = []
+
+    with StubNewsServer(failures={'TSLA': 1}) as server:
+        news, source = news_source(server, tmp_path, attempts=1)
+        fetch_many = news.client.fetch_many
+        news.client.fetch_many = lambda tickers, time_from: requested.append(list(tickers)) or fetch_many(tickers, time_from)
+
+        async def two_scheduled_runs():
+            status = SourceStatus('news')
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                task = asyncio.ensure_future(run_source(source, executor, status, forever=True))
+                while len(requested) < 2:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+            return status
+
+        status = asyncio.run(two_scheduled_runs())
+
+    # The first run failed for TSLA; the next one still requests all tickers
+    assert status.failures == 1
+    assert requested == [TICKERS, TICKERS]
+
+
+def test_rate_limit_applies_to_every_api_call(tmp_path):
+    with StubNewsServer() as server:
+        news, source = news_source(server, tmp_path)
+        # Two calls a second, no burst
+        news.client.rate_limiter = RateLimiter(120, burst=1)
+        asyncio.run(run([source]))
+
+    times = sorted(at for at, _, _ in server.requests)
+    assert len(times) == 3
+    assert times[-1] - times[0] >= 2 * 0.5 * 0.9
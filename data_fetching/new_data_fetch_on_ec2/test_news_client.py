@@ -0,0 +1,60 @@
+import os
+
+from news_client import NewsClient
+from news_stub import StubNewsServer
+
+
+def client_for(server, tmp_path, **kwargs):
+    return NewsClient(base_url=server.url, cache_dir=str(tmp_path / '_cache'), rate_per_minute=6000, **kwargs)
+
+
+def test_cached_response_is_reused(tmp_path):
+    with StubNewsServer() as server:
+        client = client_for(server, tmp_path)
+        first = client.fetch('AAPL', '20240501T0130')
+        second = client.fetch('AAPL', '20240501T0130')
+        client.fetch('AAPL', '20240502T0130')
+
+    assert first == second and len(first['feed']) == 3
+    # The second call was served from the cache; another window is a different cache entry
+    assert [params['time_from'] for _, params, _ in server.requests] == ['20240501T0130', '20240502T0130']
+    assert os.path.exists(client.cache_path('AAPL', '20240501T0130'))
+
+
+def test_stale_cache_entry_is_revalidated(tmp_path):
+    with StubNewsServer() as server:
+        client = client_for(server, tmp_path, cache_max_age=0)
+        first = client.fetch('NVDA', '20240501T0130')
+        # Unchanged: the stub answers the conditional request with a 304 and the cached feed is returned
+        assert client.fetch('NVDA', '20240501T0130') == first
+        assert server.requests[1][2].get('If-None-Match') is not None
+
+        # New articles were published in the window: the new feed replaces the cached one
+        server.articles = 5
+        assert len(client.fetch('NVDA', '20240501T0130')['feed']) == 5
+        client.cache_max_age = 3600
+        assert len(client.fetch('NVDA', '20240501T0130')['feed']) == 5
+
+        # A rate-limit note instead of a feed keeps the cached response
+        client.cache_max_age = 0
+        server.failures['NVDA'] = 1
+        assert len(client.fetch('NVDA', '20240501T0130')['feed']) == 5
+
+    assert len(server.requests) == 4
+
+
+def test_server_errors_are_retried(tmp_path):
+    with StubNewsServer(failures={'TSLA': 1}, failure_status=503) as server:
+        results = client_for(server, tmp_path).fetch_many(['AAPL', 'TSLA'], '20240501T0130')
+
+    assert len(results['TSLA']['feed']) == 3 and len(results['AAPL']['feed']) == 3
+    assert sorted(server.tickers_requested()) == ['AAPL', 'TSLA', 'TSLA']
+
+
+def test_failed_requests_are_returned_not_raised(tmp_path):
+    with StubNewsServer(failures={'TSLA': 10}, failure_status=400) as server:
+        results = client_for(server, tmp_path).fetch_many(['AAPL', 'TSLA'], '20240501T0130')
+
+    assert 'feed' in results['AAPL']
+    assert isinstance(results['TSLA'], Exception)
+    assert not os.path.exists(os.path.join(str(tmp_path / '_cache'), 'TSLA'))
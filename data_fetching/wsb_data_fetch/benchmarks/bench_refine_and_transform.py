@@ -0,0 +1,85 @@
+"""
+Micro-benchmark of the column cleanup in the loaders' refine_and_transform.
+
+Builds a synthetic chunk shaped like the raw archive data (booleans mixed with
+strings, timestamps and nulls; text with the odd NUL character), times the
+per-row Series.apply lambdas the loaders used before against the vectorized
+helpers of column_transforms, checks both give identical columns, and prints
+the timings as JSON.
+
+Run from data_fetching/wsb_data_fetch:
+    python benchmarks/bench_refine_and_transform.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from column_transforms import keep_booleans, parse_booleans, replace_nul  # noqa: E402
+
+# The per-row versions, as previously written in the loaders
+ROW_WISE = {
+    'parse_booleans': lambda s: s.apply(lambda x: True if str(x).lower() == 'true' else (False if str(x).lower() == 'false' else None)),
+    'keep_booleans': lambda s: s.apply(lambda x: x if str(x).lower() in ['true', 'false'] else None),
+    'replace_nul': lambda s: s.apply(lambda x: x.replace('\x00', '\uFFFD') if isinstance(x, str) else x),
+}
+VECTORIZED = {
+    'parse_booleans': parse_booleans,
+    'keep_booleans': keep_booleans,
+    'replace_nul': replace_nul,
+}
+
+
+def synthetic_chunk(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # Mostly real booleans, with the strings, edit timestamps and nulls found in older dumps
+    flags = np.array([True, False, 'true', 'False', None, 1600000000.0], dtype=object)
+    flag_column = flags[rng.choice(len(flags), size=rows, p=[0.45, 0.45, 0.03, 0.03, 0.02, 0.02])]
+    words = np.array(['to the moon', 'buy the dip', 'this is the way', 'bag\x00holder', ''], dtype=object)
+    text_column = words[rng.choice(len(words), size=rows, p=[0.3, 0.3, 0.3, 0.001, 0.099])]
+    text_column[rng.random(rows) < 0.02] = None
+    return pd.DataFrame({'flag': flag_column, 'text': text_column})
+
+
+def timed(function, series, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function(series)
+        best = min(best, time.perf_counter() - started_at)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs is reported')
+    args = parser.parse_args()
+
+    df = synthetic_chunk(args.rows)
+    inputs = {'parse_booleans': df['flag'], 'keep_booleans': df['flag'], 'replace_nul': df['text']}
+    # Loader chunks hold text as str columns
+    inputs['replace_nul (str dtype)'] = df['text'].astype('str')
+
+    results = {}
+    for name, series in inputs.items():
+        function_name = name.split(' ')[0]
+        expected, row_wise_seconds = timed(ROW_WISE[function_name], series, args.repeat)
+        actual, vectorized_seconds = timed(VECTORIZED[function_name], series, args.repeat)
+        pd.testing.assert_series_equal(expected, actual)
+        results[name] = {
+            "rowWiseMs": row_wise_seconds * 1000,
+            "vectorizedMs": vectorized_seconds * 1000,
+            "speedup": row_wise_seconds / vectorized_seconds,
+        }
+    print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import io
+import logging
+import time
+
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+
+def copy_payload(df):
+    """df as the text format of PostgreSQL COPY: tab-separated columns, one row per line, NULL as \\N."""
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        values = series.astype(str)
+        if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            # Backslash first, so the escapes added after it are not escaped again
+            for char, escaped in (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')):
+                values = values.str.replace(char, escaped, regex=False)
+        columns.append(values.where(series.notna().to_numpy(), '\\N'))
+    if df.empty:
+        return ''
+    lines = columns[0].str.cat(columns[1:], sep='\t') if len(columns) > 1 else columns[0]
+    return '\n'.join(lines) + '\n'
+
+
+class BulkLoader:
+    """Appends DataFrame chunks to a table as fast as the database allows.
+
+    On PostgreSQL each chunk is streamed in with `COPY ... FROM STDIN`; on other
+    databases (SQLite for local runs) it falls back to `to_sql` inserts.
+
+    With upsert=True rows whose primary key is already in the table are skipped, so the
+    copy loaded first is kept, like everywhere else in the loaders, and loading a chunk
+    a second time changes nothing (on PostgreSQL through a COPY into a temporary
+    table and one `INSERT ... ON CONFLICT DO NOTHING`).
+    ON CONFLICT needs a primary key or unique index on the key column: it is added
+    to a table that lacks one before the first chunk, and a ValueError is raised if
+    the rows already stored repeat a key.
+
+    With staging=True the chunks go to an unindexed `<table>_staging` table instead,
+    and `finish` builds the primary key and `indexes` ({name: column}) on it and then
+    swaps it in place of the table in one transaction, so a full reload never
+    maintains indexes row by row and readers never see a half-loaded table. Rows
+    repeating a primary key are removed (keeping the first loaded) before the key is
+    built. With resume=True an existing staging table is appended to, not recreated.
+    """
+
+    def __init__(self, engine, table_name, staging=False, indexes=None, primary_key=None, upsert=False, resume=False):
+        self.engine = engine
+        self.table_name = table_name
+        self.staging = staging
+        self.indexes = indexes or {}
+        self.primary_key = primary_key
+        self.upsert = upsert and primary_key is not None and not staging
+        self.resume = resume
+        self.is_postgres = engine.dialect.name == 'postgresql'
+        self.target = f'{table_name}_staging' if staging else table_name
+        self.rows_loaded = 0
+        self._prepared = False
+
+    def _table_exists(self, name):
+        return inspect(self.engine).has_table(name)
+
+    def has_staging_table(self):
+        return self.staging and self._table_exists(self.target)
+
+    def _prepare(self, df):
+        # Runs before the first chunk: (re)creates the staging table with the columns of the real table
+        if self.staging and not (self.resume and self._table_exists(self.target)):
+            with self.engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE IF EXISTS {self.target}'))
+                if self._table_exists(self.table_name):
+                    if self.is_postgres:
+                        # LIKE copies column types, defaults and NOT NULL, but no keys or indexes
+                        conn.execute(text(f'CREATE TABLE {self.target} (LIKE {self.table_name} INCLUDING DEFAULTS)'))
+                    else:
+                        conn.execute(text(f'CREATE TABLE {self.target} AS SELECT * FROM {self.table_name} WHERE 0'))
+        if not self._table_exists(self.target):
+            # Same as to_sql would do for a missing table; upserts add the primary key below
+            df.head(0).to_sql(self.target, self.engine, index=False)
+        if self.upsert and not self._has_unique_key(self.target):
+            self._add_unique_key(self.target)
+        self._prepared = True
+
+    def _has_unique_key(self, table):
+        inspector = inspect(self.engine)
+        key = [self.primary_key]
+        if inspector.get_pk_constraint(table).get('constrained_columns') == key:
+            return True
+        if any(constraint['column_names'] == key for constraint in inspector.get_unique_constraints(table)):
+            return True
+        return any(index['unique'] and index['column_names'] == key for index in inspector.get_indexes(table))
+
+    def _add_unique_key(self, table):
+        # E.g. a table created by an earlier to_sql load, which adds no keys
+        logger.warning(f"{table} has no primary key or unique index on {self.primary_key}, adding one for the upserts")
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(self._primary_key_sql(table, f'{self.table_name}_pkey')))
+        except IntegrityError as e:
+            raise ValueError(f"Cannot upsert into {table}: its rows repeat {self.primary_key} values, so no primary key "
+                             f"can be added. Remove the duplicates, or reload it with staging=True") from e
+
+    def _primary_key_sql(self, table, name):
+        if self.is_postgres:
+            return f'ALTER TABLE {table} ADD CONSTRAINT {name} PRIMARY KEY ({self.primary_key})'
+        # SQLite cannot add a primary key to an existing table; a unique index serves ON CONFLICT the same way
+        return f'CREATE UNIQUE INDEX {name} ON {table} ({self.primary_key})'
+
+    def _copy(self, df):
+        columns = ', '.join(df.columns)
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                if self.upsert:
+                    cursor.execute(f'CREATE TEMP TABLE {self.target}_chunk (LIKE {self.target} INCLUDING DEFAULTS) '
+                                   f'ON COMMIT DROP')
+                    cursor.copy_expert(f'COPY {self.target}_chunk ({columns}) FROM STDIN', io.StringIO(copy_payload(df)))
+                    cursor.execute(f'INSERT INTO {self.target} ({columns}) SELECT {columns} FROM {self.target}_chunk '
+                                   f'ON CONFLICT ({self.primary_key}) DO NOTHING')
+                else:
+                    cursor.copy_expert(f'COPY {self.target} ({columns}) FROM STDIN', io.StringIO(copy_payload(df)))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _sqlite_upsert(self, table, conn, keys, data_iter):
+        # to_sql insert method: INSERT ... ON CONFLICT (key) DO NOTHING
+        statement = sqlite_insert(table.table).on_conflict_do_nothing(index_elements=[self.primary_key])
+        result = conn.execute(statement, [dict(zip(keys, row)) for row in data_iter])
+        return result.rowcount
+
+    def load(self, df):
+        if not self._prepared:
+            self._prepare(df)
+        started_at = time.perf_counter()
+        if self.is_postgres:
+            self._copy(df)
+        else:
+            df.to_sql(self.target, self.engine, if_exists='append', index=False, chunksize=100_000,
+                      method=self._sqlite_upsert if self.upsert else None)
+        self.rows_loaded += len(df)
+        elapsed = time.perf_counter() - started_at
+        logger.info(f"Loaded {len(df)} rows into {self.target} in {elapsed:.1f}s ({len(df) / max(elapsed, 1e-9):.0f} rows/s)")
+
+    def _deduplicate_staging(self, conn):
+        # Rows are only ever appended to the staging table, so the physical order is the load order
+        if self.is_postgres:
+            conn.execute(text(f'DELETE FROM {self.target} WHERE ctid IN (SELECT ctid FROM ('
+                              f'SELECT ctid, row_number() OVER (PARTITION BY {self.primary_key} ORDER BY ctid) AS n '
+                              f'FROM {self.target}) AS ranked WHERE n > 1)'))
+        else:
+            conn.execute(text(f'DELETE FROM {self.target} WHERE rowid NOT IN '
+                              f'(SELECT min(rowid) FROM {self.target} GROUP BY {self.primary_key})'))
+
+    def finish(self):
+        """Builds the indexes on the staging table and swaps it in. Nothing to do without staging."""
+        if not self.staging:
+            return
+        # A resumed load that had nothing left to read still swaps in the staging table it filled before
+        if not self._prepared and not (self.resume and self._table_exists(self.target)):
+            return
+        logger.info(f"Building indexes on {self.target}")
+        started_at = time.perf_counter()
+        pkey_name = f'{self.table_name}_pkey'
+        if self.is_postgres:
+            # Built under temporary names, since the names are taken by the indexes of the table being replaced
+            with self.engine.begin() as conn:
+                if self.primary_key:
+                    self._deduplicate_staging(conn)
+                    conn.execute(text(self._primary_key_sql(self.target, f'{pkey_name}_staging')))
+                for name, column in self.indexes.items():
+                    conn.execute(text(f'CREATE INDEX {name}_staging ON {self.target} ({column})'))
+            with self.engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE IF EXISTS {self.table_name}'))
+                conn.execute(text(f'ALTER TABLE {self.target} RENAME TO {self.table_name}'))
+                for name in ([pkey_name] if self.primary_key else []) + list(self.indexes):
+                    conn.execute(text(f'ALTER INDEX {name}_staging RENAME TO {name}'))
+        else:
+            # SQLite cannot rename indexes, so they are built after the swap
+            with self.engine.begin() as conn:
+                if self.primary_key:
+                    self._deduplicate_staging(conn)
+                conn.execute(text(f'DROP TABLE IF EXISTS {self.table_name}'))
+                conn.execute(text(f'ALTER TABLE {self.target} RENAME TO {self.table_name}'))
+                if self.primary_key:
+                    conn.execute(text(self._primary_key_sql(self.table_name, pkey_name)))
+                for name, column in self.indexes.items():
+                    conn.execute(text(f'CREATE INDEX {name} ON {self.table_name} ({column})'))
+        logger.info(f"Swapped {self.target} in as {self.table_name} ({self.rows_loaded} rows this run, "
+                    f"indexes built in {time.perf_counter() - started_at:.1f}s)")
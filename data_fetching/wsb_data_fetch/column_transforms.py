@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Column-wise versions of the per-row cleanup lambdas of the loaders' refine_and_transform.
+# Each returns exactly what the corresponding Series.apply(lambda ...) returned.
+
+
+_type_of = np.frompyfunc(type, 1, 1)
+
+
+def _parsed_booleans(series):
+    # True/False where str(x).lower() is 'true'/'false' and None elsewhere, as an object array, plus the mask of
+    # values that already were Python bools. Those are taken as they are; only the rest is converted to text.
+    values = series.to_numpy(dtype=object)
+    parsed = np.full(len(values), None, dtype=object)
+    is_bool = (_type_of(values) == bool).astype(bool)
+    parsed[is_bool] = values[is_bool]
+    if not is_bool.all():
+        text = pd.Series(values[~is_bool]).astype(str).str.lower().to_numpy()
+        others = np.full(len(text), None, dtype=object)
+        others[text == 'true'] = True
+        others[text == 'false'] = False
+        parsed[~is_bool] = others
+    return parsed, is_bool
+
+
+def _as_applied(values, series, is_missing):
+    # Series.apply infers the result dtype: bool when every value is a bool, object when any is None
+    return pd.Series(values, index=series.index, name=series.name, dtype=object if is_missing.any() else bool)
+
+
+def parse_booleans(series):
+    """True/False for values whose text is 'true'/'false' in any case, None otherwise."""
+    if series.dtype == bool or series.empty:
+        return series.copy()
+    parsed, _ = _parsed_booleans(series)
+    return _as_applied(parsed, series, np.equal(parsed, None))
+
+
+def keep_booleans(series):
+    """The value itself if its text is 'true'/'false' in any case, None otherwise."""
+    if series.dtype == bool or series.empty:
+        return series.copy()
+    parsed, is_bool = _parsed_booleans(series)
+    is_missing = np.equal(parsed, None)
+    if is_bool[~is_missing].all():
+        # Every kept value is a real bool, so the kept values are the parsed ones
+        return _as_applied(parsed, series, is_missing)
+    values = series.to_numpy(dtype=object, copy=True)
+    values[is_missing] = None
+    return pd.Series(values, index=series.index, name=series.name).infer_objects()
+
+
+def replace_nul(series):
+    """Strings with NUL characters replaced by U+FFFD (PostgreSQL text cannot hold them); other values unchanged."""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.str.replace('\x00', '\uFFFD', regex=False)
+    try:
+        has_nul = series.str.contains('\x00', regex=False).fillna(False).astype(bool).to_numpy()
+    except AttributeError:
+        # No string values at all
+        return series.copy()
+    values = series.to_numpy(dtype=object, copy=True)
+    # Only the (rare) values that contain a NUL go through Python
+    values[has_nul] = [value.replace('\x00', '\uFFFD') for value in values[has_nul]]
+    return pd.Series(values, index=series.index, name=series.name, dtype=series.dtype)
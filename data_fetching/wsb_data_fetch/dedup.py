@@ -0,0 +1,157 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# Reddit ids are base36; up to 12 digits fit in an int64 (36 ** 12 < 2 ** 63)
+BASE36_WIDTH = 12
+_DIGITS = np.full(256, 0, dtype=np.int64)
+_DIGITS[np.frombuffer(b'0123456789abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)] = np.arange(36)
+_POWERS = 36 ** np.arange(BASE36_WIDTH - 1, -1, -1, dtype=np.int64)
+
+
+def encode_ids(ids):
+    """int64 codes of a Series of ids: the base36 value for Reddit ids, and for anything else
+    a 63-bit hash with the sign bit set, so the two kinds never collide."""
+    text = pd.Series(ids).astype(str)
+    codes = np.empty(len(text), dtype=np.int64)
+    is_base36 = text.str.fullmatch(f'[0-9a-z]{{1,{BASE36_WIDTH}}}').fillna(False).to_numpy(dtype=bool)
+    if is_base36.any():
+        padded = text[is_base36].str.pad(BASE36_WIDTH, fillchar='0').to_numpy(dtype=f'S{BASE36_WIDTH}')
+        digits = _DIGITS[np.frombuffer(padded.tobytes(), dtype=np.uint8).reshape(-1, BASE36_WIDTH)]
+        codes[is_base36] = digits @ _POWERS
+    if not is_base36.all():
+        hashed = pd.util.hash_pandas_object(text[~is_base36], index=False).to_numpy()
+        codes[~is_base36] = (hashed | np.uint64(1 << 63)).view(np.int64)
+    return codes
+
+
+def _mix(values):
+    # splitmix64 finalizer; uint64 arithmetic wraps around
+    with np.errstate(over='ignore'):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+class BloomFilter:
+    """Bit array answering "maybe seen" or "certainly not seen" for int64 codes, sized for
+    `capacity` codes at `error_rate` false positives (about 1.2 bytes a code at 1%)."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, codes):
+        # Double hashing: position i is h1 + i * h2
+        h1 = _mix(codes.view(np.uint64))
+        h2 = _mix(h1 ^ np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        size = np.uint64(self.size)
+        with np.errstate(over='ignore'):
+            return [(h1 + np.uint64(i) * h2) % size for i in range(self.hashes)]
+
+    def add(self, codes):
+        for positions in self._positions(codes):
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def might_contain(self, codes):
+        result = np.ones(len(codes), dtype=bool)
+        for positions in self._positions(codes):
+            result &= (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return result
+
+
+class SeenIds:
+    """The ids loaded so far, to drop duplicates that land in different chunks of an archive.
+
+    Ids are kept as int64 codes (see encode_ids) in a few sorted runs: every chunk adds
+    a run, and runs are merged while the one before is less than twice as long as the
+    newest, so there are O(log n) runs and membership is a binary search in each. That is 8
+    bytes an id instead of the ~100 of a Python set of strings.
+
+    For archives with more ids than fit in memory, pass `spill_dir`: runs of at least
+    `spill_min` codes are then written there as .npy files and memory-mapped, and
+    `bloom_capacity` (the expected number of ids) adds an in-memory Bloom filter in
+    front of them, so most new ids are accepted without touching the disk.
+    """
+
+    def __init__(self, spill_dir=None, spill_min=1 << 24, bloom_capacity=None, bloom_error_rate=0.01):
+        self.spill_dir = spill_dir
+        self.spill_min = spill_min
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self.runs = []
+        self._run_paths = {}
+        self._spilled = 0
+        self.count = 0
+        self.duplicates = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @property
+    def nbytes(self):
+        """Memory used, not counting spilled runs."""
+        in_memory = sum(run.nbytes for run in self.runs if id(run) not in self._run_paths)
+        return in_memory + (self.bloom.bits.nbytes if self.bloom else 0)
+
+    def contains(self, codes):
+        """Boolean mask of the codes already seen."""
+        found = np.zeros(len(codes), dtype=bool)
+        candidates = np.flatnonzero(self.bloom.might_contain(codes)) if self.bloom else np.arange(len(codes))
+        # Searching in code order walks each run front to back
+        candidates = candidates[np.argsort(codes[candidates])]
+        for run in self.runs:
+            if not len(candidates):
+                break
+            if not len(run):
+                continue
+            positions = np.minimum(np.searchsorted(run, codes[candidates]), len(run) - 1)
+            hits = run[positions] == codes[candidates]
+            found[candidates[hits]] = True
+            candidates = candidates[~hits]
+        return found
+
+    def add(self, codes):
+        """Records codes that are not in the set yet."""
+        if not len(codes):
+            return
+        run = np.sort(codes)
+        while self.runs and len(self.runs[-1]) < 2 * len(run):
+            run = np.sort(np.concatenate([self._pop_run(), run]), kind='stable')
+        self.runs.append(self._keep_run(run))
+        if self.bloom:
+            self.bloom.add(codes)
+        self.count += len(codes)
+
+    def _keep_run(self, run):
+        if not self.spill_dir or len(run) < self.spill_min:
+            return run
+        path = os.path.join(self.spill_dir, f'seen-{self._spilled:05d}.npy')
+        self._spilled += 1
+        np.save(path, run)
+        run = np.load(path, mmap_mode='r')
+        self._run_paths[id(run)] = path
+        return run
+
+    def _pop_run(self):
+        run = self.runs.pop()
+        path = self._run_paths.pop(id(run), None)
+        if path:
+            run = np.array(run)
+            os.remove(path)
+        return run
+
+    def filter_new(self, ids):
+        """Boolean mask of the ids not seen before (the first of any repeats within `ids`), which are recorded."""
+        codes = encode_ids(ids)
+        new = ~self.contains(codes) & ~pd.Series(codes).duplicated().to_numpy()
+        self.add(codes[new])
+        self.duplicates += int(len(codes) - new.sum())
+        return new
+
+    def close(self):
+        """Removes the spilled runs."""
+        while self.runs:
+            self._pop_run()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import resource
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def default_checkpoint_path(filepath, table_name):
+    return f'{filepath}.{table_name}.checkpoint.json'
+
+
+def chunk_hash(ids):
+    """Short digest of a chunk's record ids, to tell in the checkpoint which chunk was committed last."""
+    return hashlib.sha256('\n'.join(ids.astype(str)).encode('utf-8')).hexdigest()[:16]
+
+
+class LoadCheckpoint:
+    """How far a load of an archive into a table got, saved after every committed chunk.
+
+    `lines` is the number of archive records consumed by committed chunks, which is
+    where a restarted load resumes; `compressed_offset` (the position in the .zst file
+    at that point) is kept for progress reporting, since a single zstd stream cannot
+    be entered in the middle. A checkpoint of a different (or modified) archive is ignored.
+    """
+
+    def __init__(self, path, filepath):
+        self.path = path
+        self.filepath = filepath
+
+    def _archive(self):
+        stat = os.stat(self.filepath)
+        return {'file': os.path.abspath(self.filepath), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as file:
+            state = json.load(file)
+        if state.get('archive') != self._archive():
+            logger.warning(f"Ignoring checkpoint {self.path}: it was written for a different version of {self.filepath}")
+            return None
+        return state
+
+    def save(self, lines, rows_loaded, compressed_offset, last_chunk_hash):
+        state = {
+            'archive': self._archive(),
+            'lines': lines,
+            'rows_loaded': rows_loaded,
+            'compressed_offset': compressed_offset,
+            'last_chunk_hash': last_chunk_hash,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        # Written to a temporary file and renamed, so a crash never leaves a truncated checkpoint
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(state, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def peak_rss_mb():
+    # Linux reports ru_maxrss in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoadProgress:
+    """Logs rows loaded, the share of the archive read and an ETA from the compressed bytes read so far."""
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.started_at = None
+        self.start_offset = None
+
+    def report(self, rows_loaded, compressed_offset):
+        now = time.perf_counter()
+        if self.started_at is None:
+            # Rates are measured from the first committed chunk, so skipped (resumed) records do not count
+            self.started_at, self.start_offset = now, compressed_offset
+        done = compressed_offset / self.total_bytes if self.total_bytes else 1.0
+        message = f"Progress: {rows_loaded} rows loaded, {done:.1%} of the archive read"
+        elapsed = now - self.started_at
+        if elapsed > 0 and compressed_offset > self.start_offset:
+            bytes_per_second = (compressed_offset - self.start_offset) / elapsed
+            eta = (self.total_bytes - compressed_offset) / bytes_per_second
+            message += (f", {bytes_per_second / 2 ** 20:.1f} MB/s compressed, "
+                        f"ETA {int(eta // 3600)}:{int(eta % 3600 // 60):02d}:{int(eta % 60):02d}")
+        logger.info(message)
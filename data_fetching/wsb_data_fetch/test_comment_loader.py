@@ -0,0 +1,117 @@
+import json
+
+import pandas as pd
+import pytest
+import zstandard as zstd
+from sqlalchemy import create_engine, text
+
+import load_checkpoint
+import wallstreetbets_comment_loader
+from wallstreetbets_comment_loader import process_file
+
+
+def write_archive(path, comments):
+    lines = b''.join(json.dumps(comment).encode('utf-8') + b'\n' for comment in comments)
+    path.write_bytes(zstd.ZstdCompressor().compress(lines))
+    return str(path)
+
+
+def comment(comment_id, body, created_utc=1712000000):
+    return {'id': comment_id, 'link_id': 't3_post', 'parent_id': 't3_post', 'created_utc': created_utc,
+            'archived': False, 'edited': False, 'ups': 1, 'downs': 0, 'controversiality': 0, 'score': 1, 'body': body}
+
+
+def stored(db_url):
+    with create_engine(db_url).connect() as conn:
+        return pd.read_sql(text('SELECT * FROM wsb_comments ORDER BY comment_id'), conn)
+
+
+def load(archive, db_url, **kwargs):
+    process_file(archive, db_url, workers=0, chunk_size=3, checkpoint_path=f'{archive}.checkpoint.json', **kwargs)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return write_archive(tmp_path / 'comments.zst', [comment(f'c{i:02d}', f'hello {i}') for i in range(10)])
+
+
+def crash_on_call(monkeypatch, owner, name, call):
+    # Makes the `call`-th call of owner.name raise, as if the process died there
+    original, calls = getattr(owner, name), []
+
+    def crashing(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == call:
+            raise RuntimeError('simulated crash')
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, crashing)
+
+
+@pytest.mark.parametrize('crash_point', ['before the commit', 'after the commit'])
+def test_resumed_load_matches_a_clean_load(tmp_path, archive, monkeypatch, crash_point):
+    clean_url = f'sqlite:///{tmp_path / "clean.db"}'
+    load(archive, clean_url)
+
+    resumed_url = f'sqlite:///{tmp_path / "resumed.db"}'
+    with monkeypatch.context() as patch:
+        if crash_point == 'before the commit':
+            crash_on_call(patch, wallstreetbets_comment_loader.DatabaseManager, 'load_to_database', 3)
+        else:
+            # The third chunk is committed but its checkpoint is not saved, so the rerun loads it again
+            crash_on_call(patch, load_checkpoint.LoadCheckpoint, 'save', 3)
+        with pytest.raises(RuntimeError):
+            load(archive, resumed_url)
+    assert len(stored(resumed_url)) == (6 if crash_point == 'before the commit' else 9)
+    load(archive, resumed_url)
+
+    pd.testing.assert_frame_equal(stored(resumed_url), stored(clean_url))
+    assert len(stored(clean_url)) == 10
+
+
+@pytest.mark.parametrize('staging', [False, True])
+def test_first_copy_of_a_comment_is_kept_by_clean_and_resumed_loads(tmp_path, monkeypatch, staging):
+    # c01 repeats within the first chunk, and c00 and c01 again in the third and fourth
+    comments = [comment(comment_id, f'copy {n}') for n, comment_id in
+                enumerate(['c00', 'c01', 'c01', 'c02', 'c03', 'c04', 'c00', 'c05', 'c06', 'c01', 'c07'])]
+    archive = write_archive(tmp_path / 'comments.zst', comments)
+    clean_url = f'sqlite:///{tmp_path / "clean.db"}'
+    load(archive, clean_url, staging=staging)
+    df = stored(clean_url)
+    assert dict(zip(df['comment_id'], df['comment_body'])) == {
+        'c00': 'copy 0', 'c01': 'copy 1', 'c02': 'copy 3', 'c03': 'copy 4', 'c04': 'copy 5', 'c05': 'copy 7',
+        'c06': 'copy 8', 'c07': 'copy 10'}
+
+    # Crashing after the second chunk: the resumed run no longer knows c00 and c01 were loaded
+    resumed_url = f'sqlite:///{tmp_path / "resumed.db"}'
+    with monkeypatch.context() as patch:
+        crash_on_call(patch, wallstreetbets_comment_loader.DatabaseManager, 'load_to_database', 3)
+        with pytest.raises(RuntimeError):
+            load(archive, resumed_url, staging=staging)
+    load(archive, resumed_url, staging=staging)
+
+    pd.testing.assert_frame_equal(stored(resumed_url), stored(clean_url))
+
+
+def test_upsert_adds_the_missing_key_to_an_existing_table(tmp_path, archive):
+    db_url = f'sqlite:///{tmp_path / "wsb.db"}'
+    engine = create_engine(db_url)
+    # As the loader used to create it: to_sql without any key
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE wsb_comments (datetime_utc TIMESTAMP, comment_id TEXT, submission_id TEXT, '
+                          'parent_id TEXT, distinguished TEXT, archived BOOLEAN, edited BOOLEAN, ups INT, downs INT, '
+                          'controversiality INT, comment_score INT, comment_body TEXT)'))
+    load(archive, db_url)
+    load(archive, db_url)
+    assert list(stored(db_url)['comment_id']) == [f'c{i:02d}' for i in range(10)]
+
+
+def test_upsert_into_a_table_repeating_keys_fails_before_loading(tmp_path, archive):
+    db_url = f'sqlite:///{tmp_path / "wsb.db"}'
+    with create_engine(db_url).begin() as conn:
+        conn.execute(text('CREATE TABLE wsb_comments (comment_id TEXT, comment_body TEXT)'))
+        conn.execute(text("INSERT INTO wsb_comments VALUES ('c00', 'one'), ('c00', 'two')"))
+
+    with pytest.raises(ValueError, match='repeat comment_id'):
+        load(archive, db_url)
+    assert len(stored(db_url)) == 2
@@ -0,0 +1,32 @@
+import numpy as np
+
+from dedup import SeenIds, encode_ids
+
+
+def test_repeated_chunks_and_empty_chunks():
+    seen = SeenIds()
+    assert list(seen.filter_new(np.array([], dtype=object))) == []
+    assert list(seen.filter_new(['a', 'b'])) == [True, True]
+    # Nothing new: no run is added, and the next lookup still works
+    assert list(seen.filter_new(['a', 'b'])) == [False, False]
+    assert list(seen.filter_new(['c', 'a'])) == [True, False]
+    assert all(len(run) for run in seen.runs)
+    assert seen.count == 3 and seen.duplicates == 3
+
+
+def test_first_of_repeats_within_a_chunk_is_kept():
+    seen = SeenIds()
+    assert list(seen.filter_new(['x1', 'x2', 'x1', 'not base36!', 'not base36!'])) == [True, True, False, True, False]
+    assert list(seen.filter_new(['x2', 'not base36!', 'x3'])) == [False, False, True]
+
+
+def test_spilled_runs_behind_a_bloom_filter(tmp_path):
+    seen = SeenIds(spill_dir=str(tmp_path), spill_min=4, bloom_capacity=1000)
+    ids = np.array([np.base_repr(n, 36).lower() for n in range(100)], dtype=object)
+    for chunk in np.array_split(ids, 10):
+        assert seen.filter_new(chunk).all()
+    assert list(tmp_path.iterdir())
+    assert not seen.filter_new(ids).any()
+    assert seen.contains(encode_ids(['zzzz'])).tolist() == [False]
+    seen.close()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,37 @@
+import json
+
+import zstandard as zstd
+
+from wallstreetbets_comment_loader import DataLoader, DataTransformer
+from zst_reader import COMMENT_FIELDS, parse_block
+
+
+def test_integer_fields_are_not_truncated():
+    block = b'\n'.join(json.dumps(row).encode('utf-8') for row in [
+        {'id': 'a', 'score': 1.5, 'ups': 2.0, 'downs': '3', 'created_utc': 1712000000},
+        {'id': 'b', 'score': 4, 'ups': 5, 'downs': None, 'created_utc': 10 ** 20},
+    ])
+    columns = parse_block(block, COMMENT_FIELDS).to_pydict()
+
+    # 1.5 and the out-of-range timestamp are unparseable, not rounded; integral floats and numeric text are kept
+    assert columns['score'] == [None, 4]
+    assert columns['ups'] == [2, 5]
+    assert columns['downs'] == [3, None]
+    assert columns['created_utc'] == [1712000000, None]
+
+
+def test_records_missing_fields_load_as_nulls(tmp_path):
+    rows = [{'id': 'a', 'link_id': 't3_x', 'created_utc': 1712000000, 'body': 'nul\x00', 'score': 3},
+            {'id': 'b', 'link_id': 't3_x', 'created_utc': 1712000060, 'archived': 'True', 'edited': 1712000100}]
+    path = tmp_path / 'comments.zst'
+    path.write_bytes(zstd.ZstdCompressor().compress(b''.join(json.dumps(row).encode('utf-8') + b'\n' for row in rows)))
+
+    chunk_df, = DataLoader(str(path), workers=0).read_zst_to_dataframe()
+    df = DataTransformer.refine_and_transform(chunk_df)
+
+    assert list(df['comment_id']) == ['a', 'b']
+    assert list(df['archived']) == [None, True]
+    assert list(df['edited']) == [None, None]
+    assert df['comment_score'].iloc[0] == 3 and df['comment_score'].isna().tolist() == [False, True]
+    assert df['ups'].isna().all()
+    assert list(df['comment_body']) == ['nul\uFFFD', None]
@@ -1,49 +1,53 @@
+import os
 import pandas as pd
-import zstandard as zstd
-import simplejson as json
-import io
 from sqlalchemy import create_engine
 import logging
+from bulk_load import BulkLoader
+from column_transforms import parse_booleans, replace_nul
+from dedup import SeenIds
+from load_checkpoint import LoadCheckpoint, LoadProgress, chunk_hash, default_checkpoint_path, peak_rss_mb
+from zst_reader import COMMENT_FIELDS, ParallelZstReader, chunked_frames
 
 # Setup basic logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class DataLoader:
-    def __init__(self, filepath, limit=None):
+    """Reads the comment archive in DataFrame chunks of up to `chunk_size` rows.
+
+    Decompression runs in a reader thread and JSON parsing in `workers` processes
+    (by default one per core, less one for the reader; 0 parses in this process).
+    Chunks keep the file order. The first `skip_lines` records are skipped, to resume a load.
+    An archive re-sharded by zst_reshard.py is read frame by frame in the workers, and
+    `frames` (start, stop) or `time_range` (start, end) in created_utc seconds read only part of it.
+    """
+
+    def __init__(self, filepath, limit=None, workers=None, chunk_size=1024 * 1024, skip_lines=0, frames=None,
+                 time_range=None):
         self.filepath = filepath
         self.limit = limit
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.skip_lines = skip_lines
+        self.frames = frames
+        self.time_range = time_range
+        # Position in the .zst file reached by the last chunk yielded
+        self.compressed_offset = 0
 
     def read_zst_to_dataframe(self):
         logger.info(f"Starting to process file: {self.filepath}")
-        dctx = zstd.ZstdDecompressor()
         total_rows_processed = 0  # Initialize a counter for the total number of rows processed
+        reader = ParallelZstReader(self.filepath, COMMENT_FIELDS, self.workers, skip_lines=self.skip_lines,
+                                   frames=self.frames, time_range=self.time_range)
+
+        for chunk_df in chunked_frames(reader.batches(), self.chunk_size, self.limit):
+            total_rows_processed += len(chunk_df)
+            self.compressed_offset = reader.compressed_offset
+            yield chunk_df
 
-        with open(self.filepath, 'rb') as fh:
-            with dctx.stream_reader(fh) as reader:
-                text_stream = io.TextIOWrapper(reader, encoding='utf-8')
-                chunk_size = 1024 * 1024  # Define a suitable chunk size
-                
-                while True:
-                    # Adjust the chunk size if we are approaching the limit
-                    if self.limit is not None and (total_rows_processed + chunk_size) > self.limit:
-                        chunk_size = self.limit - total_rows_processed
-
-                    rows = [json.loads(line) for line, _ in zip(text_stream, range(chunk_size))]
-                    if not rows or (self.limit is not None and total_rows_processed >= self.limit):
-                        break
-
-                    total_rows_processed += len(rows)  # Update the total number of rows processed
-                    
-                    df = pd.DataFrame(rows)
-                    yield df
-                    
-                    # If a limit is set and we've reached it, stop reading further
-                    if self.limit is not None and total_rows_processed >= self.limit:
-                        logger.info(f"Reached the limit of {self.limit} rows, stopping.")
-                        break
-
-        logger.info(f"Finished processing file: {self.filepath}")
+        if self.limit is not None and total_rows_processed >= self.limit:
+            logger.info(f"Reached the limit of {self.limit} rows, stopping.")
+        logger.info(f"Finished processing file: {self.filepath} ({total_rows_processed} rows)")
 
 # CREATE TABLE wsb_comments (
 #     datetime_utc TIMESTAMP WITH TIME ZONE NOT NULL,
@@ -78,32 +82,21 @@ class DataTransformer:
             'body': 'comment_body'
         }, inplace=True)
         
-        # Convert boolean columns from string to actual boolean values or None
+        # Convert boolean columns from string to actual boolean values or None. Every column is present:
+        # zst_reader parses each field of COMMENT_FIELDS, as null where a record lacks it
         boolean_columns = ['archived', 'edited']
         for col in boolean_columns:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: True if str(x).lower() == 'true' else (False if str(x).lower() == 'false' else None))
-            else:
-                df[col] = pd.Series([pd.NA] * len(df), index=df.index).astype('Int64')
-                logger.warning(f"Column '{col}' is missing from the dataset, impacting all {len(df)} entries. This could influence subsequent data processing steps.")
+            df[col] = parse_booleans(df[col])
         
         # Convert numeric columns and handle errors by coercing to NaN, then converting NaNs to a nullable integer type
         numeric_columns = ['ups', 'downs', 'controversiality', 'comment_score']
         for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
-            else:
-                df[col] = pd.Series([pd.NA] * len(df), index=df.index).astype('Int64')
-                logger.warning(f"Column '{col}' is missing from the dataset, impacting all {len(df)} entries. This could influence subsequent data processing steps.")
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
         
         # Handle potentially nullable text columns and replace non-UTF characters
         text_columns = ['comment_body', 'distinguished']
         for col in text_columns:
-            if col in df.columns:
-                df[col] = df[col].apply(lambda x: x.replace('\x00', '\uFFFD') if isinstance(x, str) else x)
-            else:
-                df[col] = pd.Series([pd.NA] * len(df), index=df.index)
-                logger.warning(f"Column '{col}' is missing from the dataset, impacting all {len(df)} entries. This could influence subsequent data processing steps.")
+            df[col] = replace_nul(df[col])
         
         # Select and reorder the final set of columns as specified
         final_columns = ['datetime_utc', 'comment_id', 'submission_id', 'parent_id', 
@@ -111,27 +104,81 @@ class DataTransformer:
                         'controversiality', 'comment_score', 'comment_body']
         
         # Drop duplicates based on the 'comment_id' column
-        df.drop_duplicates(subset=['comment_id'], keep='last', inplace=True)
+        df.drop_duplicates(subset=['comment_id'], keep='first', inplace=True)
 
         return df[final_columns].copy()
 
 class DatabaseManager:
-    def __init__(self, db_connection_string, table_name='wsb_comments'):
+    """Loads transformed chunks with bulk_load.BulkLoader (COPY on PostgreSQL).
+
+    A row whose comment_id is already stored is skipped, so the first copy of a comment
+    in the archive is kept and a chunk loaded twice (a load resumed after a crash
+    between the commit and the checkpoint) is stored once. With staging=True the
+    load goes to an unindexed staging table that `finish` indexes and swaps in for
+    wsb_comments, i.e. the load replaces the table's contents; resume=True continues
+    filling the staging table of an interrupted load.
+    """
+
+    def __init__(self, db_connection_string, table_name='wsb_comments', staging=False, resume=False):
         self.db_engine = create_engine(db_connection_string)
         self.table_name = table_name
+        self.bulk_loader = BulkLoader(self.db_engine, table_name, staging=staging, primary_key='comment_id',
+                                      indexes={'idx_submission_id': 'submission_id', 'idx_parent_id': 'parent_id'},
+                                      upsert=True, resume=resume)
 
     def load_to_database(self, df):
         logger.info("Loading data into the database")
-        df.to_sql(self.table_name, self.db_engine, if_exists='append', index=False, method='multi')
+        self.bulk_loader.load(df)
         logger.info("Data loading complete")
 
-def process_file(filepath, db_connection_string, limit=None):
-    loader = DataLoader(filepath, limit)
-    db_manager = DatabaseManager(db_connection_string)
-    
+    def finish(self):
+        self.bulk_loader.finish()
+
+def process_file(filepath, db_connection_string, limit=None, workers=None, staging=False, checkpoint_path=None, seen_ids=None,
+                 chunk_size=1024 * 1024):
+    # Progress is checkpointed after every committed chunk; a rerun after a failure resumes from there
+    checkpoint = LoadCheckpoint(checkpoint_path or default_checkpoint_path(filepath, 'wsb_comments'), filepath)
+    state = checkpoint.read() or {}
+    db_manager = DatabaseManager(db_connection_string, staging=staging, resume=bool(state))
+    if state and staging and not db_manager.bulk_loader.has_staging_table():
+        logger.warning(f"Checkpoint {checkpoint.path} has no staging table to continue, starting over")
+        state = {}
+        db_manager.bulk_loader.resume = False
+    lines, rows_loaded = state.get('lines', 0), state.get('rows_loaded', 0)
+    if state:
+        logger.info(f"Resuming the load of {filepath} after {lines} records ({rows_loaded} rows loaded)")
+
+    loader = DataLoader(filepath, limit, workers, chunk_size, skip_lines=lines)
+    progress = LoadProgress(os.path.getsize(filepath))
+    # Duplicates within a chunk are dropped by the transform (keeping the first); a comment already
+    # loaded from an earlier chunk of this run is skipped before the insert. Either way the first copy
+    # is kept, and a resumed run, which starts with no seen ids, leaves the copy stored before the crash
+    # (see DatabaseManager). Pass a SeenIds with spill_dir and bloom_capacity for archives whose ids
+    # do not fit in memory
+    seen_ids = seen_ids or SeenIds()
+    rows_read = 0
+
     for chunk_df in loader.read_zst_to_dataframe():
+        # Counted before the transform, which drops duplicates and renames 'id'
+        lines += len(chunk_df)
+        rows_read += len(chunk_df)
+        last_chunk_hash = chunk_hash(chunk_df['id'])
         processed_df = DataTransformer.refine_and_transform(chunk_df)
-        db_manager.load_to_database(processed_df)
+        new_df = processed_df[seen_ids.filter_new(processed_df['comment_id'])]
+        if len(new_df) < len(processed_df):
+            logger.info(f"Skipped {len(processed_df) - len(new_df)} comments already loaded from earlier chunks")
+        db_manager.load_to_database(new_df)
+        rows_loaded += len(new_df)
+        checkpoint.save(lines, rows_loaded, loader.compressed_offset, last_chunk_hash)
+        progress.report(rows_loaded, loader.compressed_offset)
+
+    # A load stopped by `limit` is not finished: its checkpoint (and staging table) are kept for the next run
+    if limit is None or rows_read < limit:
+        db_manager.finish()
+        checkpoint.clear()
+    logger.info(f"Loaded {rows_loaded} comments from {filepath} ({seen_ids.duplicates} cross-chunk duplicates skipped, "
+                f"{seen_ids.nbytes / 2 ** 20:.0f} MB of seen ids), peak RSS {peak_rss_mb():.0f} MB")
+    seen_ids.close()
 
 def main():
     filepath = 'dataset/wallstreetbets_comments.zst'
@@ -1,33 +1,48 @@
+import os
 import pandas as pd
-import zstandard as zstd
-import simplejson as json
-import io
 from sqlalchemy import create_engine
 import logging
+from bulk_load import BulkLoader
+from column_transforms import keep_booleans, replace_nul
+from dedup import SeenIds
+from load_checkpoint import LoadCheckpoint, LoadProgress, chunk_hash, default_checkpoint_path, peak_rss_mb
+from zst_reader import SUBMISSION_FIELDS, ParallelZstReader, chunked_frames
 
 # Setup basic logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class DataLoader:
-    def __init__(self, filepath, limit=None):
+    """Reads the submission archive in DataFrame chunks of up to `chunk_size` rows.
+
+    Like the comment loader, blocks are decompressed in a reader thread and parsed
+    by `workers` processes, so memory use depends on the chunk size, not the archive.
+    The first `skip_lines` records are skipped, to resume a load. `frames` and
+    `time_range` read part of an archive re-sharded by zst_reshard.py, as in the comment loader.
+    """
+
+    def __init__(self, filepath, limit=None, workers=None, chunk_size=250_000, skip_lines=0, frames=None,
+                 time_range=None):
         self.filepath = filepath
         self.limit = limit
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.skip_lines = skip_lines
+        self.frames = frames
+        self.time_range = time_range
+        # Position in the .zst file reached by the last chunk yielded
+        self.compressed_offset = 0
 
     def read_zst_to_dataframe(self):
         logger.info(f"Starting to process file: {self.filepath}")
-        dctx = zstd.ZstdDecompressor()
-        rows = []
-        with open(self.filepath, 'rb') as fh:
-            with dctx.stream_reader(fh) as reader:
-                text_stream = io.TextIOWrapper(reader, encoding='utf-8')
-                for line in text_stream:
-                    if self.limit is not None and len(rows) >= self.limit:
-                        break
-                    row = json.loads(line)
-                    rows.append(row)
-        logger.info(f"Finished processing file: {self.filepath}")
-        return pd.DataFrame(rows)
+        total_rows_processed = 0
+        reader = ParallelZstReader(self.filepath, SUBMISSION_FIELDS, self.workers, skip_lines=self.skip_lines,
+                                   frames=self.frames, time_range=self.time_range)
+        for chunk_df in chunked_frames(reader.batches(), self.chunk_size, self.limit):
+            total_rows_processed += len(chunk_df)
+            self.compressed_offset = reader.compressed_offset
+            yield chunk_df
+        logger.info(f"Finished processing file: {self.filepath} ({total_rows_processed} rows)")
 
 # CREATE TABLE wsb_submissions (
 #     datetime_utc TIMESTAMP WITH TIME ZONE,
@@ -55,22 +70,22 @@ class DataTransformer:
         df.rename(columns={'selftext': 'self_text', 'score': 'post_score', 'id': 'post_id'}, inplace=True)
         final_columns = ['datetime_utc', 'post_id', 'url', 'title', 'self_text', 'is_self', 'num_comments', 'likes', 'downs', 'ups', 'post_score', 'distinguished', 'edited', 'author', 'over_18']
         # Convert each column to its correct data type
-        df['is_self'] = df['is_self'].apply(lambda x: x if str(x).lower() in ['true', 'false'] else None)
+        df['is_self'] = keep_booleans(df['is_self'])
         df['num_comments'] = pd.to_numeric(df['num_comments'], errors='coerce').astype('Int64')
         df['likes'] = pd.to_numeric(df['likes'], errors='coerce').astype('Int64')
         df['downs'] = pd.to_numeric(df['downs'], errors='coerce').astype('Int64')
         df['ups'] = pd.to_numeric(df['ups'], errors='coerce').astype('Int64')
         df['post_score'] = pd.to_numeric(df['post_score'], errors='coerce').astype('Int64')
-        df['edited'] = df['edited'].apply(lambda x: x if str(x).lower() in ['true', 'false'] else None)
-        df['over_18'] = df['over_18'].apply(lambda x: x if str(x).lower() in ['true', 'false'] else None)
+        df['edited'] = keep_booleans(df['edited'])
+        df['over_18'] = keep_booleans(df['over_18'])
         string_columns = ['url', 'title', 'self_text', 'distinguished', 'author']
         for col in string_columns:
-            df[col] = df[col].apply(lambda x: x.replace('\x00', '\uFFFD') if isinstance(x, str) else x)
+            df[col] = replace_nul(df[col])
 
         # Get the number of rows before dropping duplicates
         rows_before = df.shape[0]
         # Drop duplicates based on the 'post_id' column
-        df.drop_duplicates(subset=['post_id'], keep='last', inplace=True)
+        df.drop_duplicates(subset=['post_id'], keep='first', inplace=True)
         # Get the number of rows after dropping duplicates
         rows_after = df.shape[0]
         # Calculate the number of rows dropped
@@ -79,21 +94,65 @@ class DataTransformer:
         return df[final_columns].copy()
 
 class DatabaseManager:
-    def __init__(self, db_connection_string, table_name='wsb_submissions'):
+    """Loads transformed chunks with bulk_load.BulkLoader (COPY on PostgreSQL), skipping post_ids already stored; see the comment loader."""
+
+    def __init__(self, db_connection_string, table_name='wsb_submissions', staging=False, resume=False):
         self.db_engine = create_engine(db_connection_string)
         self.table_name = table_name
+        self.bulk_loader = BulkLoader(self.db_engine, table_name, staging=staging, primary_key='post_id', upsert=True,
+                                      resume=resume)
 
     def load_to_database(self, df):
         logger.info("Loading data into the database")
-        df.to_sql(self.table_name, self.db_engine, if_exists='append', index=False)
+        self.bulk_loader.load(df)
         logger.info("Data loading complete")
 
-def process_file(filepath, db_connection_string, limit=None):
-    loader = DataLoader(filepath, limit)
-    df = loader.read_zst_to_dataframe()
-    df = DataTransformer.refine_and_transform(df)
-    db_manager = DatabaseManager(db_connection_string)
-    db_manager.load_to_database(df)
+    def finish(self):
+        self.bulk_loader.finish()
+
+def process_file(filepath, db_connection_string, limit=None, workers=None, staging=False, checkpoint_path=None, seen_ids=None,
+                 chunk_size=250_000):
+    # Progress is checkpointed after every committed chunk; a rerun after a failure resumes from there
+    checkpoint = LoadCheckpoint(checkpoint_path or default_checkpoint_path(filepath, 'wsb_submissions'), filepath)
+    state = checkpoint.read() or {}
+    db_manager = DatabaseManager(db_connection_string, staging=staging, resume=bool(state))
+    if state and staging and not db_manager.bulk_loader.has_staging_table():
+        logger.warning(f"Checkpoint {checkpoint.path} has no staging table to continue, starting over")
+        state = {}
+        db_manager.bulk_loader.resume = False
+    lines, rows_loaded = state.get('lines', 0), state.get('rows_loaded', 0)
+    if state:
+        logger.info(f"Resuming the load of {filepath} after {lines} records ({rows_loaded} posts loaded)")
+
+    loader = DataLoader(filepath, limit, workers, chunk_size, skip_lines=lines)
+    progress = LoadProgress(os.path.getsize(filepath))
+    # Duplicates within a chunk are dropped by the transform (keeping the first); a post already
+    # loaded from an earlier chunk of this run is skipped. Either way the first copy is kept, also by a
+    # resumed run. Pass a SeenIds with spill_dir and bloom_capacity for archives whose ids do not fit in memory
+    seen_ids = seen_ids or SeenIds()
+    rows_read = 0
+
+    for chunk_df in loader.read_zst_to_dataframe():
+        # Counted before the transform, which drops duplicates and renames 'id'
+        lines += len(chunk_df)
+        rows_read += len(chunk_df)
+        last_chunk_hash = chunk_hash(chunk_df['id'])
+        processed_df = DataTransformer.refine_and_transform(chunk_df)
+        new_df = processed_df[seen_ids.filter_new(processed_df['post_id'])]
+        if len(new_df) < len(processed_df):
+            logger.info(f"Skipped {len(processed_df) - len(new_df)} posts already loaded from earlier chunks")
+        db_manager.load_to_database(new_df)
+        rows_loaded += len(new_df)
+        checkpoint.save(lines, rows_loaded, loader.compressed_offset, last_chunk_hash)
+        progress.report(rows_loaded, loader.compressed_offset)
+
+    # A load stopped by `limit` is not finished: its checkpoint (and staging table) are kept for the next run
+    if limit is None or rows_read < limit:
+        db_manager.finish()
+        checkpoint.clear()
+    logger.info(f"Loaded {rows_loaded} posts from {filepath} ({seen_ids.duplicates} cross-chunk duplicates skipped, "
+                f"{seen_ids.nbytes / 2 ** 20:.0f} MB of seen ids), peak RSS {peak_rss_mb():.0f} MB")
+    seen_ids.close()
 
 def main():
     filepath = 'dataset/wallstreetbets_submissions.zst'
@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import zstandard as zstd
+
+try:
+    import orjson as fast_json
+except ImportError:  # orjson is optional; simplejson also accepts bytes
+    import simplejson as fast_json
+
+logger = logging.getLogger(__name__)
+
+# Decompressed bytes handed to a worker at a time; blocks always end on a line boundary
+BLOCK_SIZE = 16 * 1024 * 1024
+
+# Raw comment fields the loader needs and the Arrow type each one is parsed into. Boolean fields
+# hold True/False, or null for anything else (e.g. an `edited` timestamp).
+COMMENT_FIELDS = {
+    'created_utc': pa.int64(),
+    'id': pa.string(),
+    'link_id': pa.string(),
+    'parent_id': pa.string(),
+    'distinguished': pa.string(),
+    'archived': pa.bool_(),
+    'edited': pa.bool_(),
+    'ups': pa.int64(),
+    'downs': pa.int64(),
+    'controversiality': pa.int64(),
+    'score': pa.int64(),
+    'body': pa.string(),
+}
+
+# Raw submission fields the loader needs. `edited` is a timestamp for edited posts, which parses to null.
+SUBMISSION_FIELDS = {
+    'created_utc': pa.int64(),
+    'id': pa.string(),
+    'url': pa.string(),
+    'title': pa.string(),
+    'selftext': pa.string(),
+    'is_self': pa.bool_(),
+    'num_comments': pa.int64(),
+    'likes': pa.int64(),
+    'downs': pa.int64(),
+    'ups': pa.int64(),
+    'score': pa.int64(),
+    'distinguished': pa.string(),
+    'edited': pa.bool_(),
+    'author': pa.string(),
+    'over_18': pa.bool_(),
+}
+
+
+def iter_blocks(fh, block_size=BLOCK_SIZE):
+    """Yields decompressed blocks of whole lines from an open .zst file object."""
+    dctx = zstd.ZstdDecompressor(max_window_size=2 ** 31)
+    remainder = b''
+    with dctx.stream_reader(fh, read_across_frames=True) as reader:
+        while True:
+            data = reader.read(block_size)
+            if not data:
+                break
+            data = remainder + data
+            end = data.rfind(b'\n') + 1
+            # A single line longer than the block is carried over until its end arrives
+            remainder = data[end:]
+            if end:
+                yield data[:end]
+    if remainder.strip():
+        yield remainder
+
+
+def skip_lines(blocks, count):
+    """Drops the first `count` non-blank lines from a stream of line blocks (to resume a load)."""
+    for block in blocks:
+        if count <= 0:
+            yield block
+            continue
+        lines = block.splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            if line.strip():
+                if count == 0:
+                    break
+                count -= 1
+        else:
+            # The whole block was skipped
+            continue
+        yield b''.join(lines[i:])
+
+
+def _coerce(value, arrow_type):
+    # Slow path for values that do not match the field's type, mirroring the loaders' cleanup rules
+    if value is None:
+        return None
+    if arrow_type == pa.bool_():
+        text = str(value).lower()
+        return True if text == 'true' else (False if text == 'false' else None)
+    if arrow_type == pa.int64():
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        # Non-integral (e.g. 1.5) and out-of-range numbers are not truncated but dropped, like any other unparseable value
+        return int(number) if number.is_integer() and -2 ** 63 <= number < 2 ** 63 else None
+    return value if isinstance(value, str) else str(value)
+
+
+def parse_block(block, fields):
+    """Parses the JSON lines of a block into an Arrow RecordBatch with one column per field."""
+    columns = {name: [] for name in fields}
+    for line in block.splitlines():
+        if not line.strip():
+            continue
+        row = fast_json.loads(line)
+        for name, values in columns.items():
+            values.append(row.get(name))
+
+    arrays = []
+    for name, arrow_type in fields.items():
+        values = columns[name]
+        try:
+            if arrow_type == pa.int64():
+                # Converting straight to int64 would truncate 1.5 to 1; the safe cast of the inferred array rejects it
+                arrays.append(pa.array(values).cast(arrow_type))
+            else:
+                arrays.append(pa.array(values, type=arrow_type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            arrays.append(pa.array([_coerce(value, arrow_type) for value in values], type=arrow_type))
+    return pa.RecordBatch.from_arrays(arrays, names=list(fields))
+
+
+def frame_index_path(filepath):
+    return f'{filepath}.index.json'
+
+
+def read_frame_index(filepath):
+    """The frame index zst_reshard.py wrote next to the archive, or None if there is none (or it is stale)."""
+    path = frame_index_path(filepath)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        index = json.load(file)
+    if index.get('archive_size') != os.path.getsize(filepath):
+        logger.warning(f"Ignoring frame index {path}: it does not match {filepath}")
+        return None
+    return index
+
+
+def select_frames(index, frames=None, time_range=None):
+    """The index entries of the frames numbered frames=(start, stop) that may hold records with
+    time_range[0] <= created_utc < time_range[1] (both in epoch seconds)."""
+    selected = index['frames'] if frames is None else index['frames'][slice(*frames)]
+    if time_range is not None:
+        start, end = time_range
+        selected = [frame for frame in selected if frame['min_created_utc'] is not None
+                    and frame['max_created_utc'] >= start and frame['min_created_utc'] < end]
+    return selected
+
+
+def parse_frame(filepath, frame, fields, time_range=None):
+    """Reads, decompresses and parses one frame of a re-sharded archive, keeping only the records in time_range."""
+    with open(filepath, 'rb') as fh:
+        fh.seek(frame['offset'])
+        data = fh.read(frame['size'])
+    batch = parse_block(zstd.ZstdDecompressor().decompress(data), fields)
+    if time_range is not None:
+        created_utc = batch.column(batch.schema.get_field_index('created_utc'))
+        in_range = pc.and_(pc.greater_equal(created_utc, time_range[0]), pc.less(created_utc, time_range[1]))
+        batch = batch.filter(pc.fill_null(in_range, False))
+    return batch
+
+
+class ParallelZstReader:
+    """Decompresses a .zst archive in a reader thread and parses its blocks in a process pool.
+
+    Batches are yielded in file order whatever order the workers finish in. At most
+    `2 * workers` blocks are in flight, so memory stays bounded. With workers=0 the
+    blocks are parsed in the calling process. The first `skip_lines` records are
+    decompressed but not parsed. `compressed_offset` is the position in the file
+    reached when the last yielded batch had been read.
+
+    An archive re-sharded by zst_reshard.py (it has a frame index next to it) is read
+    frame by frame instead: each worker reads, decompresses and parses whole frames,
+    resuming past `skip_lines` seeks to the right frame, and `frames` (start, stop) or
+    `time_range` (start, end) in created_utc seconds restrict the read to part of it.
+    With a time range, `skip_lines` counts the records in the range.
+    """
+
+    def __init__(self, filepath, fields, workers=None, block_size=BLOCK_SIZE, skip_lines=0, frames=None,
+                 time_range=None):
+        self.filepath = filepath
+        self.fields = fields
+        # By default one core is left to the reader thread; on a single core everything runs in-process
+        self.workers = max(0, (os.cpu_count() or 1) - 1) if workers is None else workers
+        self.block_size = block_size
+        self.skip_lines = skip_lines
+        self.time_range = time_range
+        self.compressed_offset = 0
+        self.index = read_frame_index(filepath)
+        if self.index is None and (frames is not None or time_range is not None):
+            raise ValueError(f"{filepath} has no frame index; re-shard it with zst_reshard.py to read a frame or time range")
+        self.frames = select_frames(self.index, frames, time_range) if self.index else None
+        self._records_to_skip = self._skip_frames()
+
+    def _tasks(self):
+        # (function, arguments, compressed offset reached once it has run), in file order
+        if self.frames is None:
+            with open(self.filepath, 'rb') as fh:
+                for block in skip_lines(iter_blocks(fh, self.block_size), self.skip_lines):
+                    yield parse_block, (block, self.fields), fh.tell()
+            return
+        for frame in self.frames:
+            yield parse_frame, (self.filepath, frame, self.fields, self.time_range), frame['offset'] + frame['size']
+
+    def _skip_frames(self):
+        # Frames wholly before skip_lines are not read at all; the records left to skip are dropped from the batches
+        remaining = self.skip_lines if self.frames is not None else 0
+        if self.time_range is None:
+            while self.frames and self.frames[0]['lines'] <= remaining:
+                remaining -= self.frames.pop(0)['lines']
+        return remaining
+
+    def batches(self):
+        remaining = self._records_to_skip
+        parsed = self._parsed_batches()
+        try:
+            for batch in parsed:
+                if remaining:
+                    dropped = min(remaining, batch.num_rows)
+                    batch, remaining = batch.slice(dropped), remaining - dropped
+                yield batch
+        finally:
+            parsed.close()
+
+    def _parsed_batches(self):
+        if self.workers == 0:
+            for function, args, offset in self._tasks():
+                batch = function(*args)
+                self.compressed_offset = offset
+                yield batch
+            return
+
+        pending = queue.Queue(maxsize=2 * self.workers)
+        stop = threading.Event()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            def read():
+                try:
+                    for function, args, offset in self._tasks():
+                        if stop.is_set():
+                            break
+                        pending.put((executor.submit(function, *args), offset))
+                except Exception as e:
+                    pending.put(e)
+                finally:
+                    pending.put(None)
+
+            reader = threading.Thread(target=read, name='zst-reader', daemon=True)
+            reader.start()
+            try:
+                while True:
+                    item = pending.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    future, offset = item
+                    batch = future.result()
+                    self.compressed_offset = offset
+                    yield batch
+            finally:
+                # The consumer stopped early (limit reached or an error): let the reader thread finish
+                stop.set()
+                while reader.is_alive():
+                    try:
+                        item = pending.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if item is not None and not isinstance(item, Exception):
+                        item[0].cancel()
+                reader.join()
+
+
+def chunked_frames(batches, chunk_size, limit=None):
+    """Regroups RecordBatches into DataFrames of chunk_size rows (the last may be shorter), up to `limit` rows."""
+    batches_buffered, buffered, total_rows = [], 0, 0
+    for batch in batches:
+        # Trim the last batch if we are approaching the limit
+        if limit is not None and total_rows + buffered + batch.num_rows > limit:
+            batch = batch.slice(0, limit - total_rows - buffered)
+        batches_buffered.append(batch)
+        buffered += batch.num_rows
+
+        while buffered >= chunk_size:
+            table = pa.Table.from_batches(batches_buffered)
+            chunk, rest = table.slice(0, chunk_size), table.slice(chunk_size)
+            batches_buffered, buffered = rest.to_batches(), rest.num_rows
+            total_rows += chunk.num_rows
+            yield chunk.to_pandas()
+
+        if limit is not None and total_rows + buffered >= limit:
+            break
+
+    if buffered:
+        yield pa.Table.from_batches(batches_buffered).to_pandas()
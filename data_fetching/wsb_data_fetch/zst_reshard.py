@@ -0,0 +1,93 @@
+"""
+Re-compresses a .zst archive into independently decompressible zstd frames, so it can
+be read in parallel and from any point.
+
+The Pushshift dumps are one zstd stream, which can only be decompressed from the start.
+The re-sharded archive holds the same lines in frames of about `frame_size`
+uncompressed bytes (always ending on a line boundary) and is still a valid .zst file,
+so anything that reads the original reads it too. Next to it, `<output>.index.json`
+lists for every frame its byte offset and size, its number of records, the number of
+records before it, and the earliest and latest created_utc in it:
+
+    python zst_reshard.py dataset/wallstreetbets_comments.zst dataset/wallstreetbets_comments.frames.zst
+
+ParallelZstReader (and so the loaders' DataLoader classes) picks the index up and hands
+whole frames to its workers; a frame range or a created_utc range reads only the frames
+that can hold it:
+
+    DataLoader('dataset/wallstreetbets_comments.frames.zst', time_range=(1609459200, 1612137600))
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+
+import zstandard as zstd
+
+from zst_reader import frame_index_path, iter_blocks
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FRAME_SIZE = 16 * 1024 * 1024
+# Also matches created_utc in nested objects (e.g. crossposts), which only widens a frame's time range
+CREATED_UTC = re.compile(rb'"created_utc":\s*"?(\d+)')
+
+
+def scan_frame(block):
+    """Number of records in a block of lines, and the earliest and latest created_utc in it (None if there is none)."""
+    lines = sum(1 for line in block.splitlines() if line.strip())
+    created = [int(value) for value in CREATED_UTC.findall(block)]
+    return lines, (min(created) if created else None), (max(created) if created else None)
+
+
+def reshard(filepath, output, frame_size=FRAME_SIZE, level=3, overwrite=False):
+    """Writes the archive to `output` as independent frames, and its frame index. Returns the index."""
+    if os.path.exists(output) and not overwrite:
+        raise FileExistsError(f"{output} already exists; pass overwrite=True (--overwrite) to replace it")
+    logger.info(f"Re-sharding {filepath} into frames of {frame_size / 2 ** 20:.0f} MB")
+    started_at = time.perf_counter()
+    compressor = zstd.ZstdCompressor(level=level)
+    frames = []
+    records = 0
+
+    # Written under a temporary name, so an interrupted run never leaves an archive without its index
+    partial = f'{output}.partial'
+    with open(filepath, 'rb') as source, open(partial, 'wb') as target:
+        for block in iter_blocks(source, frame_size):
+            data = compressor.compress(block)
+            lines, min_created_utc, max_created_utc = scan_frame(block)
+            frames.append({'offset': target.tell(), 'size': len(data), 'first_line': records, 'lines': lines,
+                           'min_created_utc': min_created_utc, 'max_created_utc': max_created_utc})
+            target.write(data)
+            records += lines
+            if len(frames) % 64 == 0:
+                logger.info(f"{len(frames)} frames, {records} records, {source.tell() / 2 ** 20:.0f} MB read")
+
+    index = {'source': os.path.abspath(filepath), 'archive_size': os.path.getsize(partial), 'frame_size': frame_size,
+             'records': records, 'frames': frames}
+    index_path = frame_index_path(output)
+    with open(f'{index_path}.tmp', 'w') as file:
+        json.dump(index, file, indent=1)
+    os.replace(partial, output)
+    os.replace(f'{index_path}.tmp', index_path)
+    logger.info(f"Wrote {records} records in {len(frames)} frames to {output} ({index['archive_size'] / 2 ** 20:.0f} MB) "
+                f"in {time.perf_counter() - started_at:.1f}s")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive', help='.zst archive to re-shard')
+    parser.add_argument('output', help='re-sharded .zst archive to write')
+    parser.add_argument('--frame-size', type=int, default=FRAME_SIZE // 2 ** 20, help='uncompressed MB per frame')
+    parser.add_argument('--level', type=int, default=3, help='zstd compression level')
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing output archive')
+    args = parser.parse_args()
+    reshard(args.archive, args.output, args.frame_size * 2 ** 20, args.level, args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Converts a comment or submission .zst archive straight into a Parquet dataset, without
+going through PostgreSQL.
+
+The dataset is partitioned by the year and month of `created_utc`
+(`<output>/year=2021/month=1/part-00000.parquet`) and has the columns `process_files`
+in get_data_for_prediction/data_process_pipeline.py writes, so build_context_chain
+can read either:
+
+    comments:    datetime_utc, comment_body, comment_id, parent_id, submission_id, comment_score
+    submissions: datetime_utc, title, self_text, submission_id, submission_score
+
+Id columns are dictionary-encoded and every row group carries min/max statistics, so
+a reader filtering on year/month skips whole partitions and one filtering on
+datetime_utc skips row groups:
+
+    python zst_to_parquet.py comments dataset/wallstreetbets_comments.zst wsb_lake/comments
+    python zst_to_parquet.py submissions dataset/wallstreetbets_submissions.zst wsb_lake/submissions
+
+    spark.read.parquet('wsb_lake/comments').where('year = 2021 AND month IN (1, 2)')
+"""
+import argparse
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from zst_reader import COMMENT_FIELDS, SUBMISSION_FIELDS, ParallelZstReader
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROW_GROUP_SIZE = 1024 * 1024
+# A partition that has not received rows for this many batches is closed; a late row reopens it in a new file
+KEEP_OPEN_BATCHES = 8
+
+# Archive field -> dataset column, per kind, in the column order of process_files
+LAKE_COLUMNS = {
+    'comments': {'body': 'comment_body', 'id': 'comment_id', 'parent_id': 'parent_id', 'link_id': 'submission_id',
+                 'score': 'comment_score'},
+    'submissions': {'title': 'title', 'selftext': 'self_text', 'id': 'submission_id', 'score': 'submission_score'},
+}
+ARCHIVE_FIELDS = {'comments': COMMENT_FIELDS, 'submissions': SUBMISSION_FIELDS}
+DICTIONARY_COLUMNS = ['comment_id', 'parent_id', 'submission_id']
+
+
+def lake_schema(kind):
+    fields = ARCHIVE_FIELDS[kind]
+    return pa.schema([('datetime_utc', pa.timestamp('us', tz='UTC'))] +
+                     [(column, fields[name]) for name, column in LAKE_COLUMNS[kind].items()])
+
+
+def to_lake_table(batch, kind):
+    """The rows of a parsed batch in the dataset schema, and the month (since 1970-01) each falls in.
+
+    Rows without a created_utc cannot be partitioned and are left out.
+    """
+    batch = batch.filter(pc.is_valid(batch.column('created_utc')))
+    created_utc = batch.column('created_utc')
+    datetime_utc = pc.multiply(created_utc, 1_000_000).cast(pa.timestamp('us', tz='UTC'))
+    table = pa.Table.from_arrays([datetime_utc] + [batch.column(name) for name in LAKE_COLUMNS[kind]],
+                                 schema=lake_schema(kind))
+    months = created_utc.to_numpy().astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    return table, months
+
+
+def partition_path(output, month):
+    return os.path.join(output, f'year={1970 + month // 12}', f'month={month % 12 + 1}')
+
+
+class PartitionWriter:
+    """Buffers the rows of one year/month partition and writes them in row groups of row_group_size rows."""
+
+    def __init__(self, directory, schema, row_group_size):
+        os.makedirs(directory, exist_ok=True)
+        existing = [name for name in os.listdir(directory) if name.endswith('.parquet')]
+        self.path = os.path.join(directory, f'part-{len(existing):05d}.parquet')
+        self.writer = pq.ParquetWriter(self.path, schema, compression='zstd', write_statistics=True,
+                                       use_dictionary=[name for name in schema.names if name in DICTIONARY_COLUMNS])
+        self.row_group_size = row_group_size
+        self.buffered = []
+        self.buffered_rows = 0
+        self.last_batch = 0
+
+    def write(self, table, batch_number):
+        self.buffered.append(table)
+        self.buffered_rows += table.num_rows
+        self.last_batch = batch_number
+        if self.buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffered_rows:
+            self.writer.write_table(pa.concat_tables(self.buffered), row_group_size=self.row_group_size)
+            self.buffered, self.buffered_rows = [], 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def convert(kind, filepath, output, workers=None, row_group_size=ROW_GROUP_SIZE, overwrite=False):
+    """Writes the archive as a year/month partitioned dataset at `output`. Returns the number of rows written.
+
+    The dataset is built in `<output>.partial` and renamed into place at the end, so an
+    interrupted conversion never leaves a half-written dataset behind.
+    """
+    if os.path.exists(output) and not overwrite:
+        raise FileExistsError(f"{output} already exists; pass overwrite=True (--overwrite) to replace it")
+    partial = f'{output}.partial'
+    if os.path.exists(partial):
+        shutil.rmtree(partial)
+
+    logger.info(f"Converting {filepath} into {output}")
+    started_at = time.perf_counter()
+    schema = lake_schema(kind)
+    reader = ParallelZstReader(filepath, ARCHIVE_FIELDS[kind], workers)
+    writers = {}
+    rows_written = rows_skipped = files_written = 0
+
+    for batch_number, batch in enumerate(reader.batches(), start=1):
+        table, months = to_lake_table(batch, kind)
+        rows_skipped += batch.num_rows - table.num_rows
+        # The archives are ordered by time, so a batch nearly always falls in one or two months
+        for month in np.unique(months):
+            if month not in writers:
+                writers[month] = PartitionWriter(partition_path(partial, month), schema, row_group_size)
+                files_written += 1
+            writers[month].write(table.filter(pa.array(months == month)), batch_number)
+        rows_written += table.num_rows
+
+        for month in [month for month, writer in writers.items() if batch_number - writer.last_batch >= KEEP_OPEN_BATCHES]:
+            writers.pop(month).close()
+
+    for writer in writers.values():
+        writer.close()
+
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    if os.path.exists(partial):
+        os.replace(partial, output)
+    else:
+        os.makedirs(output)
+    if rows_skipped:
+        logger.warning(f"Skipped {rows_skipped} rows without a created_utc")
+    logger.info(f"Wrote {rows_written} rows to {files_written} files in {output} in {time.perf_counter() - started_at:.1f}s")
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=sorted(LAKE_COLUMNS))
+    parser.add_argument('archive', help='.zst archive to convert')
+    parser.add_argument('output', help='dataset directory to create')
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: one per core, less one)')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing dataset at output')
+    args = parser.parse_args()
+    convert(args.kind, args.archive, args.output, args.workers, args.row_group_size, args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
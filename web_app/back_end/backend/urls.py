@@ -17,9 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
-from backendApp.views import get_data_for_stock
+from backendApp.views import get_data_for_stock, get_data_for_stock_async, get_inference_stats, \
+    get_single_flight_stats, get_metrics, get_plot_data, get_prediction_history
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('backendApp/getDataForStock/<str:ticker>', get_data_for_stock, name='stock_data')
+    path('backendApp/getDataForStock/<str:ticker>', get_data_for_stock, name='stock_data'),
+    path('backendApp/getDataForStockAsync/<str:ticker>', get_data_for_stock_async, name='stock_data_async'),
+    path('backendApp/getPlotData/<str:ticker>', get_plot_data, name='plot_data'),
+    path('backendApp/getPredictionHistory/<str:ticker>', get_prediction_history, name='prediction_history'),
+    path('backendApp/inferenceStats', get_inference_stats, name='inference_stats'),
+    path('backendApp/singleFlightStats', get_single_flight_stats, name='single_flight_stats'),
+    path('backendApp/metrics', get_metrics, name='metrics')
 ]
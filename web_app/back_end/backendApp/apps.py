@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BackendappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backendApp'
+
+    def ready(self):
+        from .warmup import WARMUP_ENABLED, start_warm_up
+
+        if WARMUP_ENABLED:
+            start_warm_up()
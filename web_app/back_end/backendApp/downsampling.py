@@ -0,0 +1,84 @@
+import threading
+
+import numpy as np
+from django.db.models import Count, Max
+
+from .models import DailyFeature, FEATURE_COLUMNS
+from .shared_models import load_shared_features
+
+CLOSE_INDEX = list(FEATURE_COLUMNS).index('Close')
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of at most ``n_out`` points of (x, y) that preserve the
+    visual shape of the series. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points are split into n_out - 2 buckets of (almost) equal size
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # The third triangle vertex is the average of the next bucket (or the last point)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+class CloseSeriesCache:
+    """Per-ticker NumPy arrays of (day number, Close), rebuilt when the ticker's rows change.
+
+    The version of a ticker is its (row count, latest date), which the (ticker, date)
+    index answers without touching the table rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    @staticmethod
+    def version(ticker):
+        stats = DailyFeature.objects.filter(ticker=ticker).aggregate(rows=Count('id'), last=Max('date'))
+        return f"{stats['rows']}-{stats['last']}"
+
+    def get(self, ticker, version=None):
+        version = version or self.version(ticker)
+        with self._lock:
+            cached = self._series.get(ticker)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        # Prefer the arrays exported to shared memory, so workers do not each hold a copy
+        shared = load_shared_features(ticker, version)
+        if shared is not None:
+            days, features = shared
+            close = features[:, CLOSE_INDEX]
+            with self._lock:
+                self._series[ticker] = (version, days, close)
+            return days, close
+        rows = list(DailyFeature.objects.filter(ticker=ticker).order_by('date').values_list('date', 'close'))
+        days = np.array([day.toordinal() for day, _ in rows], dtype=np.int64)
+        close = np.array([value for _, value in rows], dtype=np.float64)
+        with self._lock:
+            self._series[ticker] = (version, days, close)
+        return days, close
+
+
+CLOSE_SERIES = CloseSeriesCache()
@@ -0,0 +1,52 @@
+import threading
+
+import numpy as np
+
+from .models import DailyFeature, Prediction, FEATURE_COLUMNS
+from .downsampling import CLOSE_INDEX
+from .scoring import predict_batch
+
+
+class PredictionHistoryCache:
+    """Per-ticker arrays of (day number, Close, predicted Close) for every feature row.
+
+    ``predicted[i]`` is the model's prediction for day ``i``, made from the feature row
+    of day ``i - 1`` (NaN for the first day). Entries are keyed by (ticker, model version)
+    and rebuilt when the ticker's rows change, reusing predictions already published by
+    `manage.py score_predictions` and computing the rest in one batched forward pass.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history = {}
+
+    def get(self, ticker, version, data_version, load_resources):
+        key = (ticker, version)
+        with self._lock:
+            cached = self._history.get(key)
+        if cached is not None and cached[0] == data_version:
+            return cached[1:]
+
+        rows = list(DailyFeature.objects.filter(ticker=ticker).order_by('date')
+                    .values_list('date', *FEATURE_COLUMNS.values()))
+        published = dict(Prediction.objects.filter(ticker=ticker, model_version=version)
+                         .values_list('date', 'predicted_close'))
+        scored = np.array([published.get(row[0], np.nan) for row in rows], dtype=np.float64)
+        missing = np.flatnonzero(np.isnan(scored))
+        if len(missing):
+            model, scaler = load_resources(ticker.upper())
+            scored[missing] = predict_batch(model, scaler, [rows[i][1:] for i in missing])
+
+        days = np.array([row[0].toordinal() for row in rows], dtype=np.int64)
+        close = np.array([row[CLOSE_INDEX + 1] for row in rows], dtype=np.float64)
+        # Shift by one row so each prediction lines up with the day it predicts
+        predicted = np.concatenate(([np.nan], scored[:-1])) if len(rows) else scored
+        with self._lock:
+            # Series of a replaced model are not served again
+            for stale in [k for k in self._history if k[0] == ticker and k != key]:
+                del self._history[stale]
+            self._history[key] = (data_version, days, close, predicted)
+        return days, close, predicted
+
+
+PREDICTION_HISTORY = PredictionHistoryCache()
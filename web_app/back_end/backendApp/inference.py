@@ -0,0 +1,131 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+# How long the scheduler waits for more requests before running a partial batch
+BATCH_MAX_WAIT_MS = float(os.environ.get('BACKEND_BATCH_MAX_WAIT_MS', 5))
+# Largest number of samples sent to a single model.predict call
+BATCH_MAX_SIZE = int(os.environ.get('BACKEND_BATCH_MAX_SIZE', 32))
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of a list of numbers, None when there is no data yet
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _PendingSample:
+    __slots__ = ('sample', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchingPredictor:
+    """Coalesces concurrent predict calls for one model into batched model.predict calls.
+
+    Exposes the same ``predict`` method as the wrapped model, so it can be passed
+    anywhere a Keras model is expected (e.g. ``views.model_predict``).
+    """
+
+    def __init__(self, model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, name='model'):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.queue_delays = deque(maxlen=10000)
+        self._worker = threading.Thread(target=self._run, name=f'batcher-{name}', daemon=True)
+        self._worker.start()
+
+    def predict(self, x, **kwargs):
+        # Split the input into single samples, queue them and wait for the batched results
+        pending = [_PendingSample(sample) for sample in np.asarray(x)]
+        for item in pending:
+            self._queue.put(item)
+        for item in pending:
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+        return np.stack([item.result for item in pending])
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.perf_counter()
+            try:
+                results = self.model.predict(np.stack([item.sample for item in batch]))
+                for item, result in zip(batch, results):
+                    item.result = result
+            except Exception as e:
+                # Every caller in the batch gets the error instead of hanging
+                for item in batch:
+                    item.error = e
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+                self.queue_delays.extend((started_at - item.enqueued_at) * 1000 for item in batch)
+            for item in batch:
+                item.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            delays = list(self.queue_delays)
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+        return {
+            "batches": sum(batch_sizes.values()),
+            "samples": sum(size * count for size, count in batch_sizes.items()),
+            "batchSizeDistribution": batch_sizes,
+            "queueDelayMs": {f"p{q}": percentile(delays, q) for q in (50, 95, 99)},
+        }
+
+
+class InferenceScheduler:
+    """Keeps one BatchingPredictor (and therefore one queue) per model key, e.g. per ticker."""
+
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._predictors = {}
+        self._lock = threading.Lock()
+
+    def predictor(self, key, model):
+        with self._lock:
+            if key not in self._predictors:
+                self._predictors[key] = BatchingPredictor(model, self.max_batch_size, self.max_wait_ms, name=key)
+            # A reloaded model takes over the existing queue from the next batch on
+            self._predictors[key].model = model
+            return self._predictors[key]
+
+    def stats(self):
+        with self._lock:
+            predictors = dict(self._predictors)
+        return {key: predictor.stats() for key, predictor in predictors.items()}
+
+
+INFERENCE_SCHEDULER = InferenceScheduler()
@@ -0,0 +1,50 @@
+import glob
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from backendApp.models import DailyFeature, FEATURE_COLUMNS
+from backendApp.shared_models import SHARED_MODEL_DIR, export_model, export_features
+from backendApp.downsampling import CloseSeriesCache
+from backendApp.views import MODEL_DIR, SCALER_DIR
+
+
+class Command(BaseCommand):
+    help = ("Write each ticker's model weights, scaler and feature arrays once into a shared directory "
+            "(e.g. /dev/shm/stock-models) that workers memory-map read-only via BACKEND_SHARED_MODEL_DIR.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=SHARED_MODEL_DIR or '/dev/shm/stock-models')
+        parser.add_argument('--tickers', nargs='*', help='defaults to every model in MODEL_DIR')
+
+    def handle(self, *args, **options):
+        from keras.models import load_model
+        from joblib import load
+
+        shared_dir = options['dir']
+        tickers = options['tickers'] or sorted(
+            os.path.basename(path)[:-len('_model.keras')]
+            for path in glob.glob(os.path.join(MODEL_DIR, '*_model.keras')))
+        if not tickers:
+            raise CommandError(f"No models found in {MODEL_DIR}")
+
+        for ticker in (ticker.upper() for ticker in tickers):
+            model_path = os.path.join(MODEL_DIR, f"{ticker}_model.keras")
+            scaler_path = os.path.join(SCALER_DIR, f"{ticker}_scaler.joblib")
+            try:
+                export_model(ticker, load_model(model_path), load(scaler_path), model_path, scaler_path, shared_dir)
+            except ValueError as e:
+                # The NumPy forward pass would give wrong predictions for this model rather than fail
+                raise CommandError(str(e)) from e
+
+            rows = list(DailyFeature.objects.filter(ticker=ticker).order_by('date')
+                        .values_list('date', *FEATURE_COLUMNS.values()))
+            if rows:
+                days = [row[0].toordinal() for row in rows]
+                features = np.array([row[1:] for row in rows], dtype=np.float64)
+                export_features(ticker, days, features, CloseSeriesCache.version(ticker), shared_dir)
+            self.stdout.write(f"Exported {ticker} ({len(rows)} feature rows) to {shared_dir}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Start the workers with BACKEND_SHARED_MODEL_DIR={shared_dir} to attach to the exported arrays."))
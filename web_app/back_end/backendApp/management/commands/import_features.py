@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backendApp.store import import_features, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Bulk-load a pipeline output CSV (new_data_for_prediction.csv) into the DailyFeature table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='data/new_data.csv')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = import_features(options['csv_path'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} rows from {options['csv_path']}"))
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+BOOT_SCRIPT = "import django; django.setup(); {imports}"
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:       412 |       1733 |     pandas.core.frame"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Report the import-time cost of booting a worker, per top-level package and per module."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', nargs='*', default=['backend.urls'],
+                            help='modules imported after django.setup(), like a worker loading the URLconf')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+    def handle(self, *args, **options):
+        imports = '; '.join(f"import {module}" for module in options['modules'])
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'))
+        # A fresh interpreter, so nothing is already imported by this management command
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT.format(imports=imports)],
+                                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+        modules = parse_importtime(result.stderr)
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        report = {
+            "totalMs": sum(self_us for _, self_us, _ in modules) / 1000,
+            "packagesMs": {name: us / 1000 for name, us in
+                           sorted(packages.items(), key=lambda item: -item[1])[:options['top']]},
+            "modulesCumulativeMs": {name: cumulative / 1000 for name, _, cumulative in
+                                    sorted(modules, key=lambda item: -item[2])[:options['top']]},
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"Total import time: {report['totalMs']:.1f} ms\n")
+        self.stdout.write("Self time by top-level package:")
+        for name, ms in report["packagesMs"].items():
+            self.stdout.write(f"  {ms:10.1f} ms  {name}")
+        self.stdout.write("\nCumulative time by module:")
+        for name, ms in report["modulesCumulativeMs"].items():
+            self.stdout.write(f"  {ms:10.1f} ms  {name}")
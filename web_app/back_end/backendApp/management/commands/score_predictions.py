@@ -0,0 +1,51 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from backendApp.models import DailyFeature
+from backendApp.scoring import score_ticker, publish_predictions
+from backendApp.store import import_features
+
+
+class Command(BaseCommand):
+    help = ("Score every ticker with its model and publish the results to the Prediction table, "
+            "so getDataForStock only has to read them. Run after the pipeline publishes new_data_for_prediction.csv.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', help='import this pipeline CSV into the feature table first')
+        parser.add_argument('--tickers', nargs='*', help='defaults to every ticker in the feature table')
+        parser.add_argument('--backfill', action='store_true', help='score every historical row, not just the latest')
+        parser.add_argument('--processes', type=int, default=1, help='score tickers in parallel worker processes')
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        if options['csv']:
+            self.stdout.write(f"Imported {import_features(options['csv'])} rows from {options['csv']}")
+
+        tickers = options['tickers'] or list(
+            DailyFeature.objects.order_by('ticker').values_list('ticker', flat=True).distinct())
+
+        if options['processes'] > 1:
+            # Each worker loads its models once; results come back here and are written in one place,
+            # which avoids concurrent SQLite writers. Spawned workers do not inherit DB connections.
+            connections.close_all()
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(options['processes'], mp_context=context, initializer=django.setup) as pool:
+                results = list(pool.map(score_ticker, tickers, [options['backfill']] * len(tickers)))
+        else:
+            results = [score_ticker(ticker, options['backfill']) for ticker in tickers]
+
+        published = 0
+        for ticker, version, scored in results:
+            if not scored:
+                self.stdout.write(self.style.WARNING(f"{ticker}: no feature rows, skipped"))
+                continue
+            published += publish_predictions(ticker, version, scored)
+            self.stdout.write(f"{ticker}: {len(scored)} predictions (model {version})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {published} predictions for {len(results)} tickers in {time.perf_counter() - started_at:.1f}s"))
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.4 on 2026-10-19 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('adj_close', models.FloatField()),
+                ('volume', models.BigIntegerField()),
+                ('mentions', models.FloatField(null=True)),
+                ('popularity', models.FloatField(null=True)),
+                ('positive', models.FloatField(null=True)),
+                ('neutral', models.FloatField(null=True)),
+                ('negative', models.FloatField(null=True)),
+                ('daily_weighted_avg', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Prediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('model_version', models.CharField(max_length=64)),
+                ('predicted_close', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyfeature',
+            constraint=models.UniqueConstraint(fields=('ticker', 'date'), name='feature_ticker_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='prediction',
+            constraint=models.UniqueConstraint(fields=('ticker', 'date', 'model_version'), name='prediction_ticker_date_uniq'),
+        ),
+    ]
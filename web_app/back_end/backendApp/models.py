@@ -1,3 +1,65 @@
 from django.db import models
 
-# Create your models here.
+# Pipeline CSV column -> DailyFeature field, in the column order the models and scalers were trained on
+FEATURE_COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume',
+    'mentions': 'mentions',
+    'popularity': 'popularity',
+    'positive': 'positive',
+    'neutral': 'neutral',
+    'negative': 'negative',
+    'daily_weighted_avg': 'daily_weighted_avg',
+}
+
+
+class DailyFeature(models.Model):
+    """One row of new_data_for_prediction.csv: a ticker's prices and sentiment features for a day."""
+
+    ticker = models.CharField(max_length=10)
+    date = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    adj_close = models.FloatField()
+    volume = models.BigIntegerField()
+    mentions = models.FloatField(null=True)
+    popularity = models.FloatField(null=True)
+    positive = models.FloatField(null=True)
+    neutral = models.FloatField(null=True)
+    negative = models.FloatField(null=True)
+    daily_weighted_avg = models.FloatField(null=True)
+
+    class Meta:
+        # The unique constraint doubles as the composite (ticker, date) index used by every range query
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date'], name='feature_ticker_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} {self.date}"
+
+
+class Prediction(models.Model):
+    """A published predicted Close price for a ticker and day, tagged with the model that produced it."""
+
+    ticker = models.CharField(max_length=10)
+    # Date of the DailyFeature row the prediction was made from
+    date = models.DateField()
+    # See scoring.model_version: a content hash of the model file
+    model_version = models.CharField(max_length=64)
+    predicted_close = models.FloatField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'date', 'model_version'], name='prediction_ticker_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} {self.date} ({self.model_version}): {self.predicted_close}"
@@ -0,0 +1,46 @@
+import json
+import os
+import shutil
+
+# Point these at local stand-ins to run the backend without AWS or Yahoo access (e.g. for load tests)
+S3_LOCAL_DIR = os.environ.get('BACKEND_S3_LOCAL_DIR')
+TICKER_INFO_FIXTURE = os.environ.get('BACKEND_TICKER_INFO_FIXTURE')
+
+
+class LocalS3Client:
+    """Serves ``download_file`` from a directory laid out as ``<root>/<bucket>/<key>``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def download_file(self, bucket_name, key, local_path):
+        source_path = os.path.join(self.root, bucket_name, key)
+        if not os.path.exists(source_path):
+            raise FileNotFoundError(f"s3://{bucket_name}/{key} not found under {self.root}")
+        shutil.copyfile(source_path, local_path)
+
+
+class FixtureTicker:
+    """Mimics the ``info`` attribute of ``yfinance.Ticker`` from a JSON file keyed by symbol."""
+
+    _fixtures = {}
+
+    def __init__(self, ticker_symbol, fixture_path):
+        if fixture_path not in self._fixtures:
+            with open(fixture_path) as fh:
+                self._fixtures[fixture_path] = json.load(fh)
+        self.info = self._fixtures[fixture_path].get(ticker_symbol.upper(), {})
+
+
+def get_s3_client():
+    if S3_LOCAL_DIR:
+        return LocalS3Client(S3_LOCAL_DIR)
+    import boto3
+    return boto3.client('s3')
+
+
+def get_ticker(ticker_symbol):
+    if TICKER_INFO_FIXTURE:
+        return FixtureTicker(ticker_symbol, TICKER_INFO_FIXTURE)
+    import yfinance as yf
+    return yf.Ticker(ticker_symbol)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from .models import DailyFeature, Prediction, FEATURE_COLUMNS
+
+# Samples per forward pass when scoring many rows at once
+SCORING_BATCH_SIZE = 1024
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def model_version(model_path):
+    """Content hash of a model file, recomputed only when its modification time changes."""
+    key = (os.path.abspath(model_path), os.stat(model_path).st_mtime_ns)
+    with _versions_lock:
+        if key in _versions:
+            return _versions[key]
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    with _versions_lock:
+        _versions[key] = digest.hexdigest()[:16]
+    return _versions[key]
+
+
+def predict_batch(model, scaler, features, batch_size=SCORING_BATCH_SIZE):
+    """Vectorized model_predict: one prediction per row of an (n_rows, n_features) array."""
+    features = np.asarray(features, dtype=np.float64)
+    if len(features) == 0:
+        return np.empty(0, dtype=np.float32)
+    scaled = scaler.transform(features).astype('float32')
+    predictions = model.predict(scaled.reshape(len(features), 1, -1), batch_size=batch_size, verbose=0)
+    # The scalers were fitted on all features, so the prediction is placed in every column before inverting
+    copies = np.repeat(np.reshape(predictions, (-1, 1)), features.shape[1], axis=-1)
+    return scaler.inverse_transform(copies)[:, 0]
+
+
+def score_ticker(ticker, backfill=False):
+    """Predictions for a ticker's latest feature row, or for every row when backfill is set.
+
+    Returns (ticker, model_version, [(date, predicted_close), ...]). Runs in a worker
+    process under `manage.py score_predictions --processes N`, so it only reads.
+    """
+    from .views import MODEL_DIR, load_resources
+
+    queryset = DailyFeature.objects.filter(ticker=ticker).order_by('-date')
+    if not backfill:
+        queryset = queryset[:1]
+    rows = list(queryset.values_list('date', *FEATURE_COLUMNS.values()))
+    if not rows:
+        return ticker, None, []
+
+    model, scaler = load_resources(ticker.upper())
+    version = model_version(os.path.join(MODEL_DIR, f"{ticker.upper()}_model.keras"))
+    predictions = predict_batch(model, scaler, [row[1:] for row in rows])
+    return ticker, version, [(row[0], float(value)) for row, value in zip(rows, predictions)]
+
+
+def publish_predictions(ticker, version, scored, batch_size=500):
+    # Upsert in one transaction so readers see either the previous or the complete new set
+    rows = [Prediction(ticker=ticker, date=day, model_version=version, predicted_close=value)
+            for day, value in scored]
+    with transaction.atomic():
+        Prediction.objects.bulk_create(rows, batch_size=batch_size, update_conflicts=True,
+                                       unique_fields=['ticker', 'date', 'model_version'],
+                                       update_fields=['predicted_close', 'created_at'])
+    return len(rows)
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# When set, workers attach to model weights and scaler parameters exported here by
+# `manage.py export_shared_models` instead of loading their own Keras copies.
+# Use a tmpfs such as /dev/shm so the pages are shared by every worker process.
+SHARED_MODEL_DIR = os.environ.get('BACKEND_SHARED_MODEL_DIR')
+
+MANIFEST = 'manifest.json'
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'relu': lambda x: np.maximum(x, 0),
+    'linear': lambda x: x,
+}
+
+
+def _write_manifest(ticker_dir, manifest):
+    # Readers only ever see a complete manifest, and it is written after the arrays it points to
+    temp_path = os.path.join(ticker_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(temp_path, os.path.join(ticker_dir, MANIFEST))
+
+
+def check_supported(ticker, model):
+    """Raise ValueError for layers or settings that SharedModel.predict would not reproduce."""
+    previous = None
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        if kind not in ('LSTM', 'Dense'):
+            raise ValueError(f"{ticker}: layer type {kind} is not supported in shared mode")
+        config = layer.get_config()
+        problems = [f"{name}={config[name]!r}" for name in ('activation', 'recurrent_activation')
+                    if name in config and not (isinstance(config[name], str) and config[name] in ACTIVATIONS)]
+        if not config.get('use_bias', True):
+            problems.append("use_bias=False")
+        if kind == 'LSTM':
+            problems += [f"{name}=True" for name in ('go_backwards', 'stateful', 'return_state') if config.get(name)]
+            # Each LSTM step reads a (batch, time, features) input
+            if previous is not None and not (previous['type'] == 'LSTM' and previous['return_sequences']):
+                problems.append(f"input from a {previous['type']} layer that does not return sequences")
+        if problems:
+            raise ValueError(f"{ticker}: {kind} layer {layer.name} is not supported in shared mode "
+                             f"({', '.join(problems)})")
+        previous = {"type": kind, "return_sequences": config.get('return_sequences', False)}
+    if previous is None:
+        raise ValueError(f"{ticker}: the model has no LSTM or Dense layer")
+
+
+def export_model(ticker, model, scaler, model_path, scaler_path, shared_dir):
+    """Write a Keras LSTM/Dense model and its MinMaxScaler as .npy files plus a manifest."""
+    if not hasattr(scaler, 'min_') or not hasattr(scaler, 'scale_'):
+        raise ValueError(f"{ticker}: only MinMaxScaler can be shared, got {type(scaler).__name__}")
+    # Checked before anything is written, so an unsupported model leaves no partial export
+    check_supported(ticker, model)
+
+    ticker_dir = os.path.join(shared_dir, ticker)
+    # Arrays of every export live in their own directory so workers still attached to an older one are unaffected
+    version = str(os.stat(model_path).st_mtime_ns)
+    array_dir = os.path.join(ticker_dir, version)
+    os.makedirs(array_dir, exist_ok=True)
+
+    def save(name, array):
+        np.save(os.path.join(array_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        return os.path.join(version, f"{name}.npy")
+
+    layers = []
+    for index, layer in enumerate(model.layers):
+        kind = layer.__class__.__name__
+        config = layer.get_config()
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+        spec = {"type": kind, "activation": config['activation']}
+        if kind == 'LSTM':
+            spec["recurrent_activation"] = config['recurrent_activation']
+            spec["return_sequences"] = config['return_sequences']
+        names = ['kernel', 'recurrent_kernel', 'bias'] if kind == 'LSTM' else ['kernel', 'bias']
+        spec["weights"] = [save(f"{index}_{name}", weights.astype(np.float32))
+                           for name, weights in zip(names, layer.get_weights())]
+        layers.append(spec)
+
+    manifest = {
+        "ticker": ticker,
+        "source": {"model": os.path.abspath(model_path), "modelMtimeNs": os.stat(model_path).st_mtime_ns,
+                   "scaler": os.path.abspath(scaler_path), "scalerMtimeNs": os.stat(scaler_path).st_mtime_ns},
+        "layers": layers,
+        "scaler": {"min": save("scaler_min", scaler.min_), "scale": save("scaler_scale", scaler.scale_),
+                   "clip": bool(getattr(scaler, 'clip', False)), "featureRange": list(scaler.feature_range)},
+    }
+    # Keep the feature arrays of an earlier export_features call
+    previous = read_manifest(ticker, shared_dir)
+    if previous and "features" in previous:
+        manifest["features"] = previous["features"]
+    _write_manifest(ticker_dir, manifest)
+    return manifest
+
+
+def export_features(ticker, days, features, data_version, shared_dir):
+    """Write the ticker's day numbers and feature matrix next to its model for CloseSeriesCache."""
+    ticker_dir = os.path.join(shared_dir, ticker)
+    array_dir = os.path.join(ticker_dir, 'features')
+    os.makedirs(array_dir, exist_ok=True)
+    suffix = data_version.replace(':', '_')
+    np.save(os.path.join(array_dir, f"days-{suffix}.npy"), np.asarray(days, dtype=np.int64))
+    np.save(os.path.join(array_dir, f"features-{suffix}.npy"), np.asarray(features, dtype=np.float64))
+    manifest = read_manifest(ticker, shared_dir) or {"ticker": ticker}
+    manifest["features"] = {"version": data_version,
+                            "days": os.path.join('features', f"days-{suffix}.npy"),
+                            "values": os.path.join('features', f"features-{suffix}.npy")}
+    _write_manifest(ticker_dir, manifest)
+
+
+def read_manifest(ticker, shared_dir=SHARED_MODEL_DIR):
+    if not shared_dir:
+        return None
+    try:
+        with open(os.path.join(shared_dir, ticker, MANIFEST)) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def attach(ticker, relative_path, shared_dir=SHARED_MODEL_DIR):
+    # Read-only memory map: the pages stay in the shared page cache instead of the worker's heap
+    return np.load(os.path.join(shared_dir, ticker, relative_path), mmap_mode='r')
+
+
+class SharedScaler:
+    """The MinMaxScaler operations model_predict needs, backed by memory-mapped parameters."""
+
+    def __init__(self, ticker, spec, shared_dir):
+        self.min_ = attach(ticker, spec['min'], shared_dir)
+        self.scale_ = attach(ticker, spec['scale'], shared_dir)
+        self.clip = spec['clip']
+        self.feature_range = tuple(spec['featureRange'])
+        self.n_features_in_ = len(self.scale_)
+
+    @staticmethod
+    def _dtype(X):
+        # Like sklearn, keep float32 inputs as float32 so results print identically
+        return X.dtype if X.dtype.kind == 'f' else np.float64
+
+    def transform(self, X):
+        X = np.asarray(X)
+        result = X * self.scale_ + self.min_
+        if self.clip:
+            result = np.clip(result, *self.feature_range)
+        return result.astype(self._dtype(X), copy=False)
+
+    def inverse_transform(self, X):
+        X = np.asarray(X)
+        return ((X - self.min_) / self.scale_).astype(self._dtype(X), copy=False)
+
+
+class SharedModel:
+    """NumPy forward pass of a Keras LSTM/Dense stack over memory-mapped weights.
+
+    Implements ``predict`` like the Keras model it was exported from, without
+    each worker holding its own copy of the weights (or importing TensorFlow).
+    """
+
+    def __init__(self, ticker, layers, shared_dir):
+        self.layers = [
+            dict(spec, weights=[attach(ticker, path, shared_dir) for path in spec['weights']])
+            for spec in layers
+        ]
+
+    @staticmethod
+    def _lstm(x, spec):
+        kernel, recurrent_kernel, bias = spec['weights']
+        activation = ACTIVATIONS[spec['activation']]
+        recurrent_activation = ACTIVATIONS[spec['recurrent_activation']]
+        units = recurrent_kernel.shape[0]
+        h = np.zeros((x.shape[0], units), dtype=np.float32)
+        c = np.zeros((x.shape[0], units), dtype=np.float32)
+        outputs = []
+        for t in range(x.shape[1]):
+            # Keras packs the gates as input, forget, cell, output
+            z = x[:, t] @ kernel + h @ recurrent_kernel + bias
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            outputs.append(h)
+        return np.stack(outputs, axis=1) if spec['return_sequences'] else h
+
+    def predict(self, x, **kwargs):
+        x = np.asarray(x, dtype=np.float32)
+        for spec in self.layers:
+            if spec['type'] == 'LSTM':
+                x = self._lstm(x, spec)
+            else:
+                kernel, bias = spec['weights']
+                x = ACTIVATIONS[spec['activation']](x @ kernel + bias)
+        return x
+
+
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+def load_shared_resources(ticker, model_path, scaler_path, shared_dir=SHARED_MODEL_DIR):
+    """(model, scaler) attached to the shared export, or None if there is no up-to-date export."""
+    manifest = read_manifest(ticker, shared_dir)
+    if manifest is None or "layers" not in manifest:
+        return None
+    source = manifest["source"]
+    # An export older than the files in MODEL_DIR/SCALER_DIR is ignored until it is re-run
+    if (os.stat(model_path).st_mtime_ns != source["modelMtimeNs"]
+            or os.stat(scaler_path).st_mtime_ns != source["scalerMtimeNs"]):
+        print(f"Shared export for {ticker} is stale; loading the model files directly.")
+        return None
+    key = (ticker, source["modelMtimeNs"], source["scalerMtimeNs"])
+    with _attached_lock:
+        if key not in _attached:
+            _attached[key] = (SharedModel(ticker, manifest["layers"], shared_dir),
+                              SharedScaler(ticker, manifest["scaler"], shared_dir))
+        return _attached[key]
+
+
+def load_shared_features(ticker, data_version, shared_dir=SHARED_MODEL_DIR):
+    """(days, features) memory-mapped from the shared export if it matches data_version, else None."""
+    manifest = read_manifest(ticker, shared_dir)
+    if manifest is None or manifest.get("features", {}).get("version") != data_version:
+        return None
+    features = manifest["features"]
+    return attach(ticker, features["days"], shared_dir), attach(ticker, features["values"], shared_dir)
+
+
+def process_memory():
+    # Resident and proportional set size of this process in bytes; PSS splits shared pages between their users
+    memory = {}
+    for path, field, name in (('/proc/self/status', 'VmRSS:', 'rss'), ('/proc/self/smaps_rollup', 'Pss:', 'pss')):
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    if line.startswith(field):
+                        memory[name] = int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return memory
@@ -0,0 +1,84 @@
+import fcntl
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Lets concurrent callers for the same key share one in-flight computation.
+
+    The first caller for a key runs the function; callers that arrive while it is
+    running wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = Counter()
+        self.deduplicated = Counter()
+
+    def do(self, key, func, *args, **kwargs):
+        group = key[0]
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed[group] += 1
+            else:
+                self.deduplicated[group] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            groups = set(self.executed) | set(self.deduplicated)
+            return {group: {"executed": self.executed[group], "deduplicated": self.deduplicated[group]}
+                    for group in sorted(groups)}
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
+def single_flight(func):
+    # Coalesce concurrent calls of func that have the same positional arguments
+    @functools.wraps(func)
+    def wrapper(*args):
+        return SINGLE_FLIGHT.do((func.__name__,) + args, func, *args)
+    return wrapper
+
+
+@contextmanager
+def file_lock(path):
+    # Exclusive advisory lock shared by every worker process on this host
+    with open(f"{path}.lock", 'a') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
@@ -0,0 +1,62 @@
+from django.db import transaction
+
+from .models import DailyFeature, Prediction, FEATURE_COLUMNS
+
+# Rows per INSERT statement; keeps each statement well under SQLite's bound-variable limit
+IMPORT_BATCH_SIZE = 500
+
+
+def import_features(csv_path, batch_size=IMPORT_BATCH_SIZE):
+    """Upsert every row of a pipeline CSV into DailyFeature in a single transaction."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    # SQLite has no NaN, so missing values must become NULL
+    df = df.astype(object).where(df.notna(), None)
+    rows = [
+        DailyFeature(ticker=record['ticker'], date=record['date'],
+                     **{field: record[column] for column, field in FEATURE_COLUMNS.items()})
+        for record in df.to_dict('records')
+    ]
+    with transaction.atomic():
+        DailyFeature.objects.bulk_create(rows, batch_size=batch_size, update_conflicts=True,
+                                         unique_fields=['ticker', 'date'],
+                                         update_fields=list(FEATURE_COLUMNS.values()))
+    return len(rows)
+
+
+def _to_frame(rows):
+    # pandas is imported on first use to keep it out of worker boot time
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(rows, columns=['date', 'ticker', *FEATURE_COLUMNS])
+    df['date'] = df['date'].map(lambda day: day.isoformat())
+    return df
+
+
+def load_ticker_frame(ticker, start=None, end=None):
+    # Indexed range scan on (ticker, date); returns the same columns as the pipeline CSV
+    queryset = DailyFeature.objects.filter(ticker=ticker)
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    rows = queryset.order_by('date').values_list('date', 'ticker', *FEATURE_COLUMNS.values())
+    return _to_frame(list(rows))
+
+
+def load_latest_features(ticker):
+    # Model input: the most recent row for the ticker without the identifying columns
+    rows = DailyFeature.objects.filter(ticker=ticker).order_by('-date').values_list(
+        'date', 'ticker', *FEATURE_COLUMNS.values())[:1]
+    return _to_frame(list(rows)).drop(["date", "ticker"], axis=1)
+
+
+def load_published_prediction(ticker, model_version):
+    # Predicted Close for the ticker's latest feature row from the given model, or None if not yet scored
+    latest = DailyFeature.objects.filter(ticker=ticker).order_by('-date').values_list('date', flat=True).first()
+    if latest is None:
+        return None
+    return Prediction.objects.filter(ticker=ticker, date=latest, model_version=model_version).values_list(
+        'predicted_close', flat=True).first()
@@ -1,3 +1,147 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-# Create your tests here.
+from . import timing, views
+from .models import DailyFeature
+from .management.commands import export_shared_models
+from .providers import LocalS3Client
+from .shared_models import load_shared_resources
+
+BUCKET_KEY = os.path.join('733-project-new-data', 'data_for_prediction', 'new_data_for_prediction.csv')
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'new_data.csv')
+
+
+class LocalS3TestCase(TestCase):
+    # Serves the sample CSV from a local S3 stand-in and downloads it to a temporary directory
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.s3_file = os.path.join(self.tmp, 's3', BUCKET_KEY)
+        os.makedirs(os.path.dirname(self.s3_file))
+        shutil.copyfile(SAMPLE_CSV, self.s3_file)
+        for patcher in (mock.patch.object(views, 'DATA_FILE', os.path.join(self.tmp, 'new_data.csv')),
+                        mock.patch.object(views, 'get_s3_client', lambda: LocalS3Client(os.path.join(self.tmp, 's3')))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.import_features = mock.patch.object(views, 'import_features', wraps=views.import_features).start()
+        self.addCleanup(mock.patch.stopall)
+
+
+class DownloadDataForPredictionTests(LocalS3TestCase):
+    def test_imports_only_when_the_downloaded_file_changes(self):
+        views.download_data_for_prediction()
+        self.assertEqual(self.import_features.call_count, 1)
+        rows = DailyFeature.objects.count()
+        self.assertGreater(rows, 0)
+
+        # Same content on S3: the request path stays read-only
+        views.download_data_for_prediction()
+        views.download_data_for_prediction()
+        self.assertEqual(self.import_features.call_count, 1)
+
+        with open(self.s3_file, 'a') as fh:
+            fh.write('2024-04-30,1,1,1,1,1,1,AAPL,1,1,1,1,1,1\n')
+        views.download_data_for_prediction()
+        self.assertEqual(self.import_features.call_count, 2)
+        self.assertEqual(DailyFeature.objects.count(), rows + 1)
+
+    def test_failed_download_imports_the_local_file_into_an_empty_table(self):
+        shutil.copyfile(SAMPLE_CSV, views.DATA_FILE)
+        os.remove(self.s3_file)
+        views.download_data_for_prediction()
+        self.assertEqual(self.import_features.call_count, 1)
+        views.download_data_for_prediction()
+        self.assertEqual(self.import_features.call_count, 1)
+
+    def test_failed_download_leaves_no_temporary_file(self):
+        class FailingS3Client:
+            def download_file(self, bucket_name, key, local_path):
+                with open(local_path, 'w') as fh:
+                    fh.write('date,Open')
+                raise OSError('connection reset')
+
+        shutil.copyfile(SAMPLE_CSV, views.DATA_FILE)
+        with mock.patch.object(views, 'get_s3_client', FailingS3Client):
+            views.download_data_for_prediction()
+        self.assertEqual([name for name in os.listdir(self.tmp) if name.endswith('.tmp')], [])
+        # The local file is kept as it was
+        with open(views.DATA_FILE) as fh, open(SAMPLE_CSV) as sample:
+            self.assertEqual(fh.read(), sample.read())
+
+
+class PhaseMetricsTests(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, timing, 'HISTOGRAMS', timing.HISTOGRAMS)
+        timing.HISTOGRAMS = timing.PhaseHistograms()
+
+    def test_tickers_without_a_model_share_one_label(self):
+        for path in ('AAPL', 'aapl', 'NOPE', 'anything-else', 'x%22y'):
+            self.client.get(f'/backendApp/getPlotData/{path}')
+        tickers = {ticker for _, ticker in timing.HISTOGRAMS.snapshot()}
+        self.assertEqual(tickers, {'AAPL', timing.OTHER_TICKER})
+
+    def test_label_values_are_escaped(self):
+        timing.HISTOGRAMS.record([('read_data', 0.5)], 'A"B\\C\nD')
+        metrics = timing.render_prometheus()
+        self.assertIn('backend_phase_seconds_count{phase="read_data",ticker="A\\"B\\\\C\\nD"} 1', metrics)
+        self.assertTrue(all(line.startswith(('#', 'backend_')) for line in metrics.splitlines()))
+
+
+class AsyncStockViewTests(LocalS3TestCase):
+    def test_async_view_matches_the_sync_view(self):
+        company_info = [{"attribute": "Name", "value": "Apple Inc."}]
+        with mock.patch.object(views, 'get_company_info', lambda ticker: company_info):
+            sync_response = self.client.get('/backendApp/getDataForStock/AAPL')
+            async_response = self.client.get('/backendApp/getDataForStockAsync/AAPL')
+        self.assertEqual(async_response.status_code, 200, async_response.content)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+
+class ExportSharedModelsTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        os.makedirs(os.path.join(self.tmp, 'scalers'))
+        for name, value in (('MODEL_DIR', self.tmp), ('SCALER_DIR', os.path.join(self.tmp, 'scalers'))):
+            patcher = mock.patch.object(export_shared_models, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def save_model(self, ticker, **lstm_options):
+        import keras
+        from joblib import dump
+        from sklearn.preprocessing import MinMaxScaler
+
+        model = keras.Sequential([keras.Input((1, 4)), keras.layers.LSTM(8, **lstm_options), keras.layers.Dense(1)])
+        model.save(os.path.join(self.tmp, f'{ticker}_model.keras'))
+        dump(MinMaxScaler().fit(np.random.rand(10, 4)), os.path.join(self.tmp, 'scalers', f'{ticker}_scaler.joblib'))
+        return model
+
+    def export(self, ticker):
+        call_command('export_shared_models', '--dir', os.path.join(self.tmp, 'shared'), '--tickers', ticker,
+                     stdout=io.StringIO())
+
+    def test_exported_model_predicts_like_keras(self):
+        model = self.save_model('GOOD')
+        self.export('GOOD')
+        model_path = os.path.join(self.tmp, 'GOOD_model.keras')
+        scaler_path = os.path.join(self.tmp, 'scalers', 'GOOD_scaler.joblib')
+        shared_model, _ = load_shared_resources('GOOD', model_path, scaler_path, os.path.join(self.tmp, 'shared'))
+        x = np.random.rand(3, 1, 4).astype('float32')
+        np.testing.assert_allclose(shared_model.predict(x), model.predict(x, verbose=0), rtol=1e-4, atol=1e-6)
+
+    def test_settings_the_forward_pass_does_not_implement_are_rejected(self):
+        for ticker, options in (('NOBIAS', {'use_bias': False}), ('BACKWARDS', {'go_backwards': True}),
+                                ('HARD', {'recurrent_activation': 'hard_sigmoid'}), ('ELU', {'activation': 'elu'})):
+            self.save_model(ticker, **options)
+            with self.assertRaisesRegex(CommandError, 'not supported in shared mode'):
+                self.export(ticker)
+            self.assertFalse(os.path.exists(os.path.join(self.tmp, 'shared', ticker)))
@@ -0,0 +1,196 @@
+import glob
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .inference import percentile
+
+# Number of most recent samples kept per (phase, ticker) for the rolling quantiles
+WINDOW_SIZE = 1024
+QUANTILES = (50, 95, 99)
+
+# Label of every ticker without a model: the ticker comes from the URL, so recording it as-is
+# would let any request path add a series that is kept forever
+OTHER_TICKER = 'other'
+
+# Spans recorded by the request currently being handled, as a list of (phase, seconds)
+_current_spans = ContextVar('current_spans', default=None)
+
+
+class PhaseHistograms:
+    """Rolling latency windows plus running count/sum for every (phase, ticker) pair."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._counts = {}
+        self._sums = {}
+
+    def record(self, spans, ticker=''):
+        with self._lock:
+            for phase, seconds in spans:
+                key = (phase, ticker)
+                window = self._windows.get(key)
+                if window is None:
+                    window = self._windows[key] = deque(maxlen=self.window_size)
+                    self._counts[key] = 0
+                    self._sums[key] = 0.0
+                window.append(seconds)
+                self._counts[key] += 1
+                self._sums[key] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {key: (list(window), self._counts[key], self._sums[key]) for key, window in self._windows.items()}
+
+
+HISTOGRAMS = PhaseHistograms()
+
+
+@contextmanager
+def span(phase):
+    # Times the enclosed block; outside a request the sample goes straight to the histograms
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        spans = _current_spans.get()
+        if spans is None:
+            HISTOGRAMS.record([(phase, elapsed)])
+        else:
+            spans.append((phase, elapsed))
+
+
+async def timed(phase, awaitable):
+    # span() for an awaitable, e.g. one branch of an asyncio.gather
+    with span(phase):
+        return await awaitable
+
+
+@lru_cache(maxsize=4)
+def _model_tickers(model_dir, modified):
+    return frozenset(os.path.basename(path)[:-len('_model.keras')].upper()
+                     for path in glob.glob(os.path.join(model_dir, '*_model.keras')))
+
+
+def ticker_label(ticker):
+    """The ticker if it has a model in MODEL_DIR, OTHER_TICKER otherwise ('' stays '')."""
+    from .views import MODEL_DIR
+
+    if not ticker:
+        return ''
+    try:
+        # Re-listed only when a model is added or removed
+        tickers = _model_tickers(MODEL_DIR, os.stat(MODEL_DIR).st_mtime_ns)
+    except FileNotFoundError:
+        return OTHER_TICKER
+    return ticker if ticker in tickers else OTHER_TICKER
+
+
+def server_timing_header(spans):
+    return ', '.join(f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in spans)
+
+
+class TimingMiddleware:
+    """Collects the spans of each request into a Server-Timing header and the phase histograms."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        spans = []
+        token = _current_spans.set(spans)
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_spans.reset(token)
+        return self._finish(request, response, spans, started_at)
+
+    async def __acall__(self, request):
+        spans = []
+        token = _current_spans.set(spans)
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_spans.reset(token)
+        return self._finish(request, response, spans, started_at)
+
+    def _finish(self, request, response, spans, started_at):
+        if not spans:
+            return response
+        spans.append(('total', time.perf_counter() - started_at))
+        match = getattr(request, 'resolver_match', None)
+        ticker = match.kwargs.get('ticker', '').upper() if match else ''
+        HISTOGRAMS.record(spans, ticker_label(ticker))
+        response['Server-Timing'] = server_timing_header(spans)
+        return response
+
+
+def _escape(value):
+    # Label values escape backslash, double quote and newline in the text exposition format
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus(inference_stats=None, single_flight_stats=None, memory=None):
+    # Prometheus text exposition format (version 0.0.4)
+    lines = [
+        '# HELP backend_phase_seconds Latency of backend request phases over the most recent requests.',
+        '# TYPE backend_phase_seconds summary',
+    ]
+    for (phase, ticker), (window, count, total) in sorted(HISTOGRAMS.snapshot().items()):
+        for q in QUANTILES:
+            lines.append(f"backend_phase_seconds{_labels(phase=phase, ticker=ticker, quantile=q / 100)} "
+                         f"{percentile(window, q)}")
+        lines.append(f"backend_phase_seconds_sum{_labels(phase=phase, ticker=ticker)} {total}")
+        lines.append(f"backend_phase_seconds_count{_labels(phase=phase, ticker=ticker)} {count}")
+
+    if inference_stats:
+        lines.append('# HELP backend_inference_batches_total Batched predict calls by batch size.')
+        lines.append('# TYPE backend_inference_batches_total counter')
+        for model, stats in sorted(inference_stats.items()):
+            for size, count in stats["batchSizeDistribution"].items():
+                lines.append(f"backend_inference_batches_total{_labels(model=model, size=size)} {count}")
+        lines.append('# HELP backend_inference_queue_delay_ms Time samples waited in the inference queue.')
+        lines.append('# TYPE backend_inference_queue_delay_ms summary')
+        for model, stats in sorted(inference_stats.items()):
+            for name, value in stats["queueDelayMs"].items():
+                quantile = int(name[1:]) / 100
+                lines.append(f"backend_inference_queue_delay_ms{_labels(model=model, quantile=quantile)} "
+                             f"{'NaN' if value is None else value}")
+
+    if single_flight_stats:
+        lines.append('# HELP backend_singleflight_calls_total Coalesced calls by outcome.')
+        lines.append('# TYPE backend_singleflight_calls_total counter')
+        for operation, stats in sorted(single_flight_stats.items()):
+            for outcome, count in stats.items():
+                lines.append(f"backend_singleflight_calls_total{_labels(operation=operation, outcome=outcome)} {count}")
+
+    if memory:
+        lines.append('# HELP backend_process_memory_bytes Resident (rss) and proportional (pss) memory of this worker.')
+        lines.append('# TYPE backend_process_memory_bytes gauge')
+        for kind, value in sorted(memory.items()):
+            lines.append(f"backend_process_memory_bytes{_labels(pid=os.getpid(), kind=kind)} {value}")
+
+    return '\n'.join(lines) + '\n'
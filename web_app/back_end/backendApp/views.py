@@ -1,26 +1,68 @@
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse, JsonResponse
-from keras.models import load_model
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
 import numpy as np
-import pandas as pd
-import yfinance as yf
-from joblib import load
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import filecmp
 import os
-import boto3
+
+from .inference import INFERENCE_SCHEDULER, BATCH_MAX_SIZE
+from .singleflight import SINGLE_FLIGHT, single_flight, file_lock
+from .timing import span, timed, render_prometheus
+from .providers import get_s3_client, get_ticker
+from .models import DailyFeature
+from .store import import_features, load_ticker_frame, load_latest_features, load_published_prediction
+from .downsampling import CLOSE_SERIES, lttb
+from .shared_models import load_shared_resources, process_memory
+from .scoring import model_version
+from .history import PREDICTION_HISTORY
 
 MODEL_DIR = './models'
 SCALER_DIR = './models/scalers'
+# Local copy of the S3 prediction file; load tests point it at a scratch directory
+DATA_FILE = os.environ.get('BACKEND_DATA_FILE', 'data/new_data.csv')
+
+# Default number of points returned by getPlotData when maxPoints is not given
+PLOT_MAX_POINTS = 500
+
+# Per-call timeout (seconds) for the blocking I/O steps of the async view
+IO_TIMEOUT = float(os.environ.get('BACKEND_IO_TIMEOUT', 10))
 
+# Bounded pool for inference calls. The threads mostly wait on the per-model batcher in
+# inference.py, which runs the actual predict, so it is sized to fill one batch.
+INFERENCE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('BACKEND_INFERENCE_WORKERS', BATCH_MAX_SIZE)),
+                                        thread_name_prefix='inference')
+
+
+# Models and scalers already loaded by this process, keyed by ticker and file modification times
+_resource_cache = {}
 
 # Function to load models and scalers on demand
+@single_flight
 def load_resources(ticker):
     model_path = os.path.join(MODEL_DIR, f"{ticker.upper()}_model.keras")
     scaler_path = os.path.join(SCALER_DIR, f"{ticker.upper()}_scaler.joblib")
 
-    model = load_model(model_path)
-    scaler = load(scaler_path)
+    # Attach to the weights shared by all workers when they have been exported
+    shared = load_shared_resources(ticker.upper(), model_path, scaler_path)
+    if shared is not None:
+        return shared
+
+    key = (ticker.upper(), os.stat(model_path).st_mtime_ns, os.stat(scaler_path).st_mtime_ns)
+    if key not in _resource_cache:
+        # Imported here rather than at module level: keras pulls in TensorFlow, which takes
+        # seconds and is not needed by management commands or when serving shared weights
+        from keras.models import load_model
+        from joblib import load
 
-    return model, scaler
+        model = load_model(model_path)
+        scaler = load(scaler_path)
+        _resource_cache[key] = (model, scaler)
+
+    return _resource_cache[key]
 
 
 # Improved prediction function
@@ -82,9 +124,10 @@ def get_prediction_variables(input_data):
 
     return prediction_variables
 
+@single_flight
 def get_company_info(ticker_symbol):
     # Fetch the ticker data using yfinance
-    ticker = yf.Ticker(ticker_symbol)
+    ticker = get_ticker(ticker_symbol)
 
     # Attempt to fetch the info dictionary for the ticker
     info = ticker.info
@@ -98,43 +141,97 @@ def get_company_info(ticker_symbol):
 
     return company_info
 
+@single_flight
+def download_data_for_prediction():
+    # The path to where you want to download the file
+    local_file_path = DATA_FILE
+    modified_before = os.path.getmtime(local_file_path) if os.path.exists(local_file_path) else None
+    # Only one worker process downloads at a time; the others wait and reuse its file
+    with file_lock(local_file_path):
+        if os.path.exists(local_file_path) and os.path.getmtime(local_file_path) != modified_before:
+            print("File was refreshed by another worker, skipping download.")
+            return
+        changed = False
+        try:
+            # Create an S3 client
+            s3 = get_s3_client()
+            # The name of your S3 bucket
+            bucket_name = '733-project-new-data'
+            # The path to your file on S3
+            s3_file_path = 'data_for_prediction/new_data_for_prediction.csv'
+            # Download to a temporary file and swap it in, so readers never see a partial file
+            temp_file_path = f"{local_file_path}.{os.getpid()}.tmp"
+            try:
+                s3.download_file(bucket_name, s3_file_path, temp_file_path)
+                changed = not (os.path.exists(local_file_path)
+                               and filecmp.cmp(temp_file_path, local_file_path, shallow=False))
+                if changed:
+                    os.replace(temp_file_path, local_file_path)
+                    print("File downloaded successfully.")
+            finally:
+                # Left behind by a failed download or an unchanged file
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+        except Exception as e:
+            # This block is executed if any error occurs in the try block
+            print(f"Failed to download file: {e}. Will proceed using the existing local version of the file.")
+        # Views query the feature table, so a file is imported only when its content changed (or nothing was imported yet)
+        if changed or not DailyFeature.objects.exists():
+            import_features(local_file_path)
+
+def load_ticker_data(ticker):
+    # Download the latest file once and return every row for the ticker, sorted by date
+    with span('s3_download'):
+        download_data_for_prediction()
+    with span('read_data'):
+        return load_ticker_frame(ticker)
+
+def get_input_data(ticker_data):
+    # The model input is the most recent row without the identifying columns
+    return ticker_data.drop(["date", "ticker"], axis=1).tail(1)
+
 def load_data_for_prediction(ticker):
-    try:
-        # Create an S3 client
-        s3 = boto3.client('s3')
-        # The name of your S3 bucket
-        bucket_name = '733-project-new-data'
-        # The path to your file on S3
-        s3_file_path = 'data_for_prediction/new_data_for_prediction.csv'
-        # The path to where you want to download the file
-        local_file_path = 'data/new_data.csv'
-        # Download the file
-        s3.download_file(bucket_name, s3_file_path, local_file_path)
-        print("File downloaded successfully.")
-    except Exception as e:
-        # This block is executed if any error occurs in the try block
-        print(f"Failed to download file: {e}. Will proceed using the existing local version of the file.")
-    input_data = pd.read_csv('data/new_data.csv')
-    input_data = input_data.sort_values(by="date").drop(["date", "ticker"], axis=1)[input_data["ticker"] == ticker].tail(1)
-    return input_data
+    with span('s3_download'):
+        download_data_for_prediction()
+    with span('read_data'):
+        return load_latest_features(ticker)
 
-def load_data_for_graph(ticker, result):
-    df = pd.read_csv('data/new_data.csv')
-    df = df.sort_values(by="date")[df["ticker"] == ticker]
-    df = df[["date", "Close", "ticker"]]
+def build_graph_data(ticker_data, ticker, result):
+    import pandas as pd
+
+    df = ticker_data[["date", "Close", "ticker"]]
     new_row = {"date": datetime.now().strftime('%Y-%m-%d'), "Close": result, "ticker":ticker}
     new_row_df = pd.DataFrame([new_row])
     df = pd.concat([df, new_row_df], ignore_index=True)
     return df.to_json(orient='records', lines=False)
 
+def load_data_for_graph(ticker, result):
+    return build_graph_data(load_ticker_frame(ticker), ticker, result)
+
+def get_published_prediction(ticker):
+    # Prediction published by `manage.py score_predictions` for the latest data and the current model, if any
+    with span('published_prediction'):
+        version = model_version(os.path.join(MODEL_DIR, f"{ticker.upper()}_model.keras"))
+        published = load_published_prediction(ticker, version)
+    # Stored as a double; float32 keeps the response identical to an on-demand prediction
+    return None if published is None else np.array([published], dtype='float32')
+
 def get_data_for_stock(request, ticker):  # Notice 'ticker' is now a parameter of the function
     try:
-        model, scaler = load_resources(ticker.upper())
         input_data = load_data_for_prediction(ticker)
-        predictions = model_predict(input_data, model, scaler)
-        company_info = get_company_info(ticker.upper())
+        predictions = get_published_prediction(ticker)
+        if predictions is None:
+            with span('model_load'):
+                model, scaler = load_resources(ticker.upper())
+            # Concurrent requests for the same ticker share one batched predict call
+            model = INFERENCE_SCHEDULER.predictor(ticker.upper(), model)
+            with span('predict'):
+                predictions = model_predict(input_data, model, scaler)
+        with span('company_info'):
+            company_info = get_company_info(ticker.upper())
         prediction_variables = get_prediction_variables(input_data)
-        plot_data = load_data_for_graph(ticker, str(predictions[0]))
+        with span('graph'):
+            plot_data = load_data_for_graph(ticker, str(predictions[0]))
         response_data = {
             "predictionResult": [{"attribute": "Predicted Price", "value": str(predictions[0])},
                                  {"attribute": "Date", "value": datetime.now().strftime('%Y-%m-%d')}],  # Ensure the value is a string or serializable type
@@ -144,4 +241,140 @@ def get_data_for_stock(request, ticker):  # Notice 'ticker' is now a parameter o
         }
         return JsonResponse(response_data)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=400)
+
+async def run_with_timeout(func, *args, thread_sensitive=False):
+    # Run a blocking call in a worker thread, giving up after IO_TIMEOUT seconds. Calls that use the
+    # ORM pass thread_sensitive=True, so they run where Django manages their database connection
+    return await asyncio.wait_for(sync_to_async(func, thread_sensitive=thread_sensitive)(*args), timeout=IO_TIMEOUT)
+
+async def get_company_info_async(ticker_symbol):
+    # Company metadata is cosmetic, so a slow or failing yfinance must not fail the whole request
+    try:
+        return await run_with_timeout(get_company_info, ticker_symbol)
+    except Exception as e:
+        print(f"Failed to fetch company info for {ticker_symbol}: {e!r}")
+        return [
+            {"attribute": "Name", "value": "N/A"},
+            {"attribute": "Ticker", "value": ticker_symbol},
+            {"attribute": "Industry", "value": "N/A"},
+        ]
+
+async def get_data_for_stock_async(request, ticker):
+    try:
+        # Feature data and company metadata are independent, so fetch them concurrently
+        ticker_data, company_info = await asyncio.gather(
+            run_with_timeout(load_ticker_data, ticker, thread_sensitive=True),
+            timed('company_info', get_company_info_async(ticker.upper())),
+        )
+        input_data = get_input_data(ticker_data)
+        # The published prediction can only be looked up once the latest data is known;
+        # on a miss the model is usually already in this worker's cache
+        predictions = await run_with_timeout(get_published_prediction, ticker, thread_sensitive=True)
+        if predictions is None:
+            model, scaler = await timed('model_load', run_with_timeout(load_resources, ticker.upper()))
+            model = INFERENCE_SCHEDULER.predictor(ticker.upper(), model)
+            # Only inference depends on the data load; keep it off the event loop
+            with span('predict'):
+                predictions = await sync_to_async(model_predict, thread_sensitive=False,
+                                                  executor=INFERENCE_EXECUTOR)(input_data, model, scaler)
+        prediction_variables = get_prediction_variables(input_data)
+        # The graph series comes from the same read as the features, so no second CSV scan is needed
+        with span('graph'):
+            plot_data = build_graph_data(ticker_data, ticker, str(predictions[0]))
+        response_data = {
+            "predictionResult": [{"attribute": "Predicted Price", "value": str(predictions[0])},
+                                 {"attribute": "Date", "value": datetime.now().strftime('%Y-%m-%d')}],
+            "companyInfo": company_info,
+            "predictionVariables": prediction_variables,
+            "plotData": plot_data
+        }
+        return JsonResponse(response_data)
+    except asyncio.TimeoutError:
+        return JsonResponse({'error': f'Timed out after {IO_TIMEOUT} seconds'}, status=504)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+def get_inference_stats(request):
+    # Batch-size distribution and queueing delay of the per-model inference queues
+    return JsonResponse(INFERENCE_SCHEDULER.stats())
+
+def get_single_flight_stats(request):
+    # Executed vs deduplicated calls per coalesced operation
+    return JsonResponse(SINGLE_FLIGHT.stats())
+
+def get_metrics(request):
+    # Phase latency quantiles, inference batching and coalescing counters for Prometheus to scrape
+    metrics = render_prometheus(INFERENCE_SCHEDULER.stats(), SINGLE_FLIGHT.stats(), process_memory())
+    return HttpResponse(metrics, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def plot_data_etag(request, ticker):
+    # Changes whenever the ticker's rows or the requested range/resolution change
+    request.plot_data_version = CLOSE_SERIES.version(ticker)
+    return f"{ticker}-{request.plot_data_version}-{request.GET.urlencode()}"
+
+@gzip_page
+@condition(etag_func=plot_data_etag)
+def get_plot_data(request, ticker):
+    try:
+        start = date.fromisoformat(request.GET['start']) if 'start' in request.GET else None
+        end = date.fromisoformat(request.GET['end']) if 'end' in request.GET else None
+        max_points = int(request.GET.get('maxPoints', PLOT_MAX_POINTS))
+        if max_points < 2:
+            raise ValueError("maxPoints must be at least 2")
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    with span('read_data'):
+        days, close = CLOSE_SERIES.get(ticker, getattr(request, 'plot_data_version', None))
+    # Both arrays are sorted by day, so the date range is two binary searches
+    lo = np.searchsorted(days, start.toordinal(), side='left') if start else 0
+    hi = np.searchsorted(days, end.toordinal(), side='right') if end else len(days)
+    days, close = days[lo:hi], close[lo:hi]
+    with span('downsample'):
+        selected = lttb(days, close, max_points)
+    return JsonResponse({
+        "ticker": ticker,
+        "dates": [date.fromordinal(int(day)).isoformat() for day in days[selected]],
+        "close": close[selected].tolist(),
+    })
+
+def prediction_history_etag(request, ticker):
+    # Changes with the model file, the ticker's rows or the requested range
+    try:
+        request.history_model_version = model_version(os.path.join(MODEL_DIR, f"{ticker.upper()}_model.keras"))
+    except FileNotFoundError:
+        return None
+    request.history_data_version = CLOSE_SERIES.version(ticker)
+    return f"{ticker}-{request.history_model_version}-{request.history_data_version}-{request.GET.urlencode()}"
+
+@single_flight
+def load_prediction_history(ticker, version, data_version):
+    return PREDICTION_HISTORY.get(ticker, version, data_version, load_resources)
+
+@gzip_page
+@condition(etag_func=prediction_history_etag)
+def get_prediction_history(request, ticker):
+    try:
+        start = date.fromisoformat(request.GET['start']) if 'start' in request.GET else None
+        end = date.fromisoformat(request.GET['end']) if 'end' in request.GET else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    version = getattr(request, 'history_model_version', None)
+    if version is None:
+        return JsonResponse({'error': f"No model for {ticker}"}, status=404)
+
+    with span('predict'):
+        days, close, predicted = load_prediction_history(ticker, version, request.history_data_version)
+    lo = np.searchsorted(days, start.toordinal(), side='left') if start else 0
+    hi = np.searchsorted(days, end.toordinal(), side='right') if end else len(days)
+    days, close, predicted = days[lo:hi], close[lo:hi], predicted[lo:hi]
+    known = ~np.isnan(predicted)
+    return JsonResponse({
+        "ticker": ticker,
+        "modelVersion": version,
+        "dates": [date.fromordinal(int(day)).isoformat() for day in days],
+        "close": close.tolist(),
+        "predicted": [float(value) if ok else None for value, ok in zip(predicted, known)],
+        "meanAbsoluteError": float(np.abs(predicted[known] - close[known]).mean()) if known.any() else None,
+    })
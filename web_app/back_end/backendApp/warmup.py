@@ -0,0 +1,34 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+# Set to 1 to import the heavy dependencies and load every ticker's model when a worker boots,
+# so the first request does not pay for them. Off by default to keep manage.py commands fast.
+WARMUP_ENABLED = os.environ.get('BACKEND_WARMUP', '0').lower() in ('1', 'true', 'yes')
+
+
+def warm_up():
+    """Import pandas/keras and load, and run once, every ticker model found in MODEL_DIR."""
+    from .views import MODEL_DIR, load_resources
+
+    started_at = time.perf_counter()
+    import pandas  # noqa: F401
+
+    tickers = sorted(os.path.basename(path)[:-len('_model.keras')]
+                     for path in glob.glob(os.path.join(MODEL_DIR, '*_model.keras')))
+    for ticker in tickers:
+        try:
+            model, scaler = load_resources(ticker)
+            # The first predict call builds the inference graph; do it here instead of in a request
+            model.predict(np.zeros((1, 1, scaler.n_features_in_), dtype='float32'))
+        except Exception as e:
+            print(f"Warm-up failed for {ticker}: {e!r}")
+    print(f"Warm-up of {len(tickers)} models finished in {time.perf_counter() - started_at:.2f} seconds")
+
+
+def start_warm_up():
+    # In the background, so the worker starts accepting requests immediately
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
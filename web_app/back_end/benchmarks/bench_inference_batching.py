@@ -0,0 +1,88 @@
+"""
+Load benchmark for the micro-batching inference queue.
+
+Drives one ticker model from many client threads, first with direct
+single-sample ``model.predict`` calls and then through a BatchingPredictor,
+and prints throughput and latency percentiles for both as JSON.
+
+Run from web_app/back_end:
+    python benchmarks/bench_inference_batching.py --ticker AAPL --clients 32 --requests 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backendApp.inference import BatchingPredictor, percentile  # noqa: E402
+
+
+def drive(predict, clients, requests_per_client, n_features):
+    latencies = []
+    lock = threading.Lock()
+    sample = np.random.rand(1, 1, n_features).astype('float32')
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            started_at = time.perf_counter()
+            predict(sample)
+            local.append((time.perf_counter() - started_at) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    return {
+        "requests": len(latencies),
+        "throughputRps": len(latencies) / elapsed,
+        "latencyMs": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticker', default='AAPL')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    # views imports the app's models, so Django has to be set up before it is imported
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+    from backendApp.views import load_resources
+    model, scaler = load_resources(args.ticker.upper())
+    n_features = scaler.n_features_in_
+
+    # Warm up so graph tracing is not counted against either mode
+    model.predict(np.zeros((1, 1, n_features), dtype='float32'))
+
+    single = drive(model.predict, args.clients, args.requests, n_features)
+    predictor = BatchingPredictor(model, args.max_batch_size, args.max_wait_ms, name=args.ticker.upper())
+    batched = drive(predictor.predict, args.clients, args.requests, n_features)
+    batched["scheduler"] = predictor.stats()
+
+    print(json.dumps({
+        "ticker": args.ticker.upper(),
+        "clients": args.clients,
+        "single": single,
+        "batched": batched,
+        "speedup": batched["throughputRps"] / single["throughputRps"],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start budget check for the backend, suitable for CI.
+
+For each run, a fresh interpreter boots the WSGI application (what a new
+worker does) and then serves its first getDataForStock request against the
+local S3/yfinance stand-ins from load_test.py. The median boot and
+first-request times are printed as JSON, and the script exits with status 1
+if either exceeds its budget.
+
+Run from web_app/back_end:
+    python benchmarks/bench_startup.py --boot-budget-ms 1000 --first-request-budget-ms 15000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import BACK_END_DIR, prepare_database, prepare_stubs, server_env  # noqa: E402
+
+CHILD_SCRIPT = """
+import json, sys, time
+started_at = time.perf_counter()
+from backend.wsgi import application
+booted_at = time.perf_counter()
+from django.test import Client
+response = Client(HTTP_HOST='localhost').get('/backendApp/getDataForStock/' + sys.argv[1])
+finished_at = time.perf_counter()
+print(json.dumps({"bootMs": (booted_at - started_at) * 1000, "firstRequestMs": (finished_at - booted_at) * 1000,
+                  "status": response.status_code}))
+"""
+
+HEAVY_MODULES = ['tensorflow', 'keras', 'pandas', 'yfinance', 'boto3', 'joblib']
+
+BOOT_CHECK_SCRIPT = """
+import json, sys
+from backend.wsgi import application
+print(json.dumps([name for name in sys.argv[1:] if name in sys.modules]))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticker', default='AAPL')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--boot-budget-ms', type=float, default=1000)
+    parser.add_argument('--first-request-budget-ms', type=float, default=15000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        s3_root, ticker_info_file = prepare_stubs(workdir, os.path.join(BACK_END_DIR, 'data', 'new_data.csv'), None)
+        env = server_env(workdir, s3_root, ticker_info_file, BACKEND_WARMUP='0')
+        prepare_database(workdir, env)
+
+        heavy_at_boot = json.loads(subprocess.run(
+            [sys.executable, '-c', BOOT_CHECK_SCRIPT, *HEAVY_MODULES], cwd=BACK_END_DIR, env=env,
+            capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+        runs = []
+        for _ in range(args.runs):
+            result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, args.ticker.upper()], cwd=BACK_END_DIR,
+                                    env=env, capture_output=True, text=True, check=True)
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    boot_ms = statistics.median(run["bootMs"] for run in runs)
+    first_request_ms = statistics.median(run["firstRequestMs"] for run in runs)
+    failures = []
+    if boot_ms > args.boot_budget_ms:
+        failures.append(f"worker boot {boot_ms:.0f} ms exceeds budget of {args.boot_budget_ms:.0f} ms")
+    if first_request_ms > args.first_request_budget_ms:
+        failures.append(f"first request {first_request_ms:.0f} ms exceeds budget of "
+                        f"{args.first_request_budget_ms:.0f} ms")
+    if any(run["status"] != 200 for run in runs):
+        failures.append(f"first request returned {[run['status'] for run in runs]}")
+    if heavy_at_boot:
+        failures.append(f"heavy modules imported at boot: {', '.join(heavy_at_boot)}")
+
+    print(json.dumps({
+        "bootMs": boot_ms,
+        "firstRequestMs": first_request_ms,
+        "budgetsMs": {"boot": args.boot_budget_ms, "firstRequest": args.first_request_budget_ms},
+        "heavyModulesAtBoot": heavy_at_boot,
+        "runs": runs,
+        "failures": failures,
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Load-test harness for backendApp/getDataForStock/<ticker>.
+
+Starts the Django app against local stand-ins for S3 (a directory laid out as
+<root>/<bucket>/<key>) and yfinance (a JSON fixture of ticker info), drives the
+endpoint from a pool of client threads with a weighted ticker mix, and prints
+RPS, latency percentiles, error rate and RSS per server process as JSON.
+
+Run from web_app/back_end:
+    python benchmarks/load_test.py --concurrency 16 --duration 30 --mix AAPL=2,NVDA=1,TSLA=1
+    python benchmarks/load_test.py --server gunicorn --workers 4 --output results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACK_END_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACK_END_DIR)
+
+from backendApp.inference import percentile  # noqa: E402
+
+BUCKET_NAME = '733-project-new-data'
+S3_KEY = 'data_for_prediction/new_data_for_prediction.csv'
+
+DEFAULT_TICKER_INFO = {
+    "AAPL": {"longName": "Apple Inc.", "industry": "Consumer Electronics"},
+    "NVDA": {"longName": "NVIDIA Corporation", "industry": "Semiconductors"},
+    "TSLA": {"longName": "Tesla, Inc.", "industry": "Auto Manufacturers"},
+}
+
+ENDPOINTS = {
+    'sync': '/backendApp/getDataForStock/{ticker}',
+    'async': '/backendApp/getDataForStockAsync/{ticker}',
+}
+
+
+def parse_mix(mix):
+    # "AAPL=2,NVDA=1" -> (["AAPL", "NVDA"], [2.0, 1.0])
+    tickers, weights = [], []
+    for item in mix.split(','):
+        ticker, _, weight = item.partition('=')
+        tickers.append(ticker.strip().upper())
+        weights.append(float(weight or 1))
+    return tickers, weights
+
+
+def prepare_stubs(workdir, data_file, ticker_info_file):
+    # The S3 file is downloaded to the workdir (BACKEND_DATA_FILE in server_env), not over data/new_data.csv
+    s3_root = os.path.join(workdir, 's3')
+    os.makedirs(os.path.join(s3_root, BUCKET_NAME, os.path.dirname(S3_KEY)))
+    shutil.copyfile(data_file, os.path.join(s3_root, BUCKET_NAME, S3_KEY))
+    if ticker_info_file is None:
+        ticker_info_file = os.path.join(workdir, 'ticker_info.json')
+        with open(ticker_info_file, 'w') as fh:
+            json.dump(DEFAULT_TICKER_INFO, fh)
+    return s3_root, ticker_info_file
+
+
+def server_env(workdir, s3_root, ticker_info_file, **extra):
+    # Environment of the server under test: local stand-ins, and every file it writes inside workdir
+    return dict(os.environ, BACKEND_S3_LOCAL_DIR=s3_root, BACKEND_TICKER_INFO_FIXTURE=ticker_info_file,
+                BACKEND_DATA_FILE=os.path.join(workdir, 'new_data.csv'), DJANGO_SETTINGS_MODULE='backend.settings',
+                **extra)
+
+
+def prepare_database(workdir, env):
+    # Run against a migrated copy of the database so the checked-in db.sqlite3 is left untouched
+    db_path = os.path.join(workdir, 'db.sqlite3')
+    shutil.copyfile(os.path.join(BACK_END_DIR, 'db.sqlite3'), db_path)
+    env['BACKEND_DB_PATH'] = db_path
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=BACK_END_DIR, env=env, check=True)
+
+
+def server_command(server, port, workers):
+    if server == 'gunicorn':
+        return ['gunicorn', 'backend.wsgi:application', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                '--threads', '8']
+    if server == 'uvicorn':
+        return ['uvicorn', 'backend.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+                '--workers', str(workers)]
+    return [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/backendApp/metrics')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start listening on port {port} within {timeout} seconds")
+
+
+def process_tree(pid):
+    # The server process and all of its descendants (e.g. gunicorn workers)
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                ppid = int(fh.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def warm_up(port, path_template, tickers, rounds):
+    # Every ticker in turn, so each model is loaded before measuring
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        for _ in range(rounds):
+            for ticker in tickers:
+                conn.request('GET', path_template.format(ticker=ticker))
+                conn.getresponse().read()
+    finally:
+        conn.close()
+
+
+def drive(port, path_template, tickers, weights, concurrency, duration, total_requests):
+    latencies, statuses, errors = [], Counter(), Counter()
+    lock = threading.Lock()
+    issued = iter(range(total_requests)) if total_requests else None
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local_latencies, local_statuses, local_errors = [], Counter(), Counter()
+        while True:
+            if issued is not None:
+                if next(issued, None) is None:
+                    break
+            elif time.perf_counter() >= deadline:
+                break
+            ticker = random.choices(tickers, weights)[0]
+            started_at = time.perf_counter()
+            try:
+                conn.request('GET', path_template.format(ticker=ticker))
+                response = conn.getresponse()
+                response.read()
+                local_statuses[response.status] += 1
+                if response.status >= 400:
+                    local_errors[f"HTTP {response.status}"] += 1
+            except Exception as e:
+                local_errors[type(e).__name__] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local_latencies.append((time.perf_counter() - started_at) * 1000)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            errors.update(local_errors)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "requests": len(latencies),
+        "durationSeconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latencyMs": {"p50": percentile(latencies, 50), "p90": percentile(latencies, 90),
+                      "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+                      "max": max(latencies) if latencies else None},
+        "errorRate": sum(errors.values()) / len(latencies) if latencies else 0.0,
+        "statusCodes": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": dict(errors),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACK_END_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['runserver', 'gunicorn', 'uvicorn'], default='runserver')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes (gunicorn/uvicorn)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='sync')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run when --requests is not given')
+    parser.add_argument('--requests', type=int, default=0, help='total requests to send instead of a fixed duration')
+    parser.add_argument('--mix', default='AAPL=1,NVDA=1,TSLA=1', help='weighted ticker mix, e.g. AAPL=2,TSLA=1')
+    parser.add_argument('--warmup', type=int, default=1, help='requests per ticker before measuring')
+    parser.add_argument('--data', default=os.path.join(BACK_END_DIR, 'data', 'new_data.csv'),
+                        help='CSV served as the S3 prediction file')
+    parser.add_argument('--ticker-info', default=None, help='JSON fixture of yfinance info keyed by ticker')
+    parser.add_argument('--shared-model-dir', default=None,
+                        help='serve from weights exported with `manage.py export_shared_models --dir ...`')
+    parser.add_argument('--output', default=None, help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    tickers, weights = parse_mix(args.mix)
+    path_template = ENDPOINTS[args.endpoint]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        s3_root, ticker_info_file = prepare_stubs(workdir, args.data, args.ticker_info)
+        env = server_env(workdir, s3_root, ticker_info_file)
+        if args.shared_model_dir:
+            env['BACKEND_SHARED_MODEL_DIR'] = args.shared_model_dir
+        prepare_database(workdir, env)
+        server = subprocess.Popen(server_command(args.server, args.port, args.workers), cwd=BACK_END_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(args.port)
+            warm_up(args.port, path_template, tickers, args.warmup)
+            result = drive(args.port, path_template, tickers, weights, args.concurrency, args.duration, args.requests)
+            processes = {str(pid): rss_mb(pid) for pid in process_tree(server.pid)}
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "commit": git_commit(),
+        "server": args.server,
+        "workers": args.workers,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "mix": dict(zip(tickers, weights)),
+        "sharedModelDir": args.shared_model_dir,
+        **result,
+        "rssMbPerProcess": processes,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()